@@ -1,88 +1,571 @@
-from fastapi import FastAPI, BackgroundTasks
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import FastAPI, HTTPException, Query, Response
 from pydantic import BaseModel
+from typing import Optional
 import scraper
+import jobs
+import listings
+import frontier
+import checkpoint
+import metrics
+import profiling
+import parquet_sink
+import raw_archive
+import rate_limit
+import selector_stats
+import contextvars
+import os
+import socket
+import threading
 import time
-import pandas as pd
+import uuid
+
+OUTPUT_CSV = "encuentra24_final_cleaned.csv"
+# Where flushed batches go: "parquet" (date-partitioned dataset in PARQUET_DIR), "csv" (OUTPUT_CSV) or "both"
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "parquet")
+# Rows cleaned and flushed to the CSV and the database at a time
+SCRAPER_BATCH_SIZE = int(os.getenv("SCRAPER_BATCH_SIZE", "50"))
 
 class ScrapeRequest(BaseModel):
     pages: int
+    concurrency: int = scraper.SCRAPER_CONCURRENCY
+    incremental: bool = False  # Only scrape listings that are new or whose card changed
+    batch_size: int = SCRAPER_BATCH_SIZE
+    distributed: bool = False  # Share the crawl with other replicas through the Postgres frontier
+    profile: bool = False  # Profile the fetch, parse, clean and load stages (see profiling.py)
+
+class FrontierWorkerRequest(BaseModel):
+    concurrency: int = scraper.SCRAPER_CONCURRENCY
+    batch_size: int = SCRAPER_BATCH_SIZE
+    profile: bool = False
+
+class ReparseRequest(BaseModel):
+    since: Optional[str] = None  # Only pages fetched at or after this ISO date/time
+    batch_size: int = SCRAPER_BATCH_SIZE
+
+job_manager = jobs.JobManager()
+
+for _status in (jobs.QUEUED, jobs.RUNNING, jobs.COMPLETED, jobs.FAILED, jobs.CANCELLED):
+    metrics.JOBS.labels(_status).set_function(
+        lambda status=_status: sum(1 for job in job_manager.list() if job.status == status))
+
+
+def resume_interrupted_jobs():
+    """
+    Keeps the checkpoints of this process's jobs alive and resumes, under their original
+    ids, the jobs whose process stopped sending heartbeats (restart, deploy or crash).
+    """
+    while True:
+        try:
+            checkpoint.heartbeat()
+            for job_id, params in checkpoint.claim_stale():
+                print(f"↩️ Resuming interrupted job {job_id}")
+                job_manager.submit(run_scraping_task, job_id=job_id, **params)
+        except Exception as e:
+            print(f"Checkpoint heartbeat failed: {e}")
+        time.sleep(checkpoint.CHECKPOINT_HEARTBEAT)
+
+
+def build_listing_indexes():
+    try:
+        scraper.create_listing_indexes()
+    except Exception as e:
+        print(f"Could not build the listing indexes: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # One-off schema step, off the load path: concurrent builds don't block the loads meanwhile
+    threading.Thread(target=build_listing_indexes, name="listing-indexes", daemon=True).start()
+    if checkpoint.CHECKPOINTS_ENABLED:
+        threading.Thread(target=resume_interrupted_jobs, name="checkpoint-heartbeat", daemon=True).start()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@contextmanager
+def report_cache_stats():
+    """Prints the response cache hits/misses of the fetches made inside the block when it ends, failed or not"""
+    with scraper.count_cache_stats() as stats:
+        try:
+            yield
+        finally:
+            print(f"HTTP cache: {stats['hits']} hits, {stats['misses']} misses")
+
+
+def iter_listings(base_list_url, pages, incremental, job=None, ckpt=None):
+    """
+    Streams listings page by page, dropping unchanged ones in incremental mode. With a
+    checkpoint, the crawl starts after the last finished page and skips listings already loaded.
+    """
+    start_page = ckpt.pages_done + 1 if ckpt else 1
+    for page, page_listings in scraper.iter_numbered_listing_pages(base_list_url, max_pages=pages,
+                                                                   start_page=start_page):
+        print(f"Found {len(page_listings)} listings")
+        if incremental and page_listings:
+            page_listings = scraper.filter_new_or_changed(page_listings)
+        if ckpt:
+            page_listings = [listing for listing in page_listings if listing["link"] not in ckpt.done_urls]
+            ckpt.page_listed(page, [listing["link"] for listing in page_listings])
+        if job:
+            job.add(pages_done=1, listings_found=len(page_listings))
+            if job.cancelled:
+                return
+        yield from page_listings
+
+
+def flush_batch(rows, first_batch, profiler=None):
+    """
+    Cleans one micro-batch of scraped rows, appends it to the output files and loads it to the
+    database. Returns the number of rows loaded; a failed load raises instead.
+    """
+    prepare_raw_frame = scraper.prepare_raw_frame
+    clean_data = scraper.clean_data
+    load_data_to_db = scraper.load_data_to_db
+    if profiler is not None:
+        prepare_raw_frame = profiler.wrap("clean", prepare_raw_frame)
+        clean_data = profiler.wrap("clean", clean_data)
+        load_data_to_db = profiler.wrap("load", load_data_to_db)
+
+    df_raw = prepare_raw_frame(rows)
+
+    # Call the new cleaning function
+    df_cleaned = clean_data(df_raw.copy())
+    if OUTPUT_FORMAT in ("parquet", "both"):
+        # Every batch adds its own file to the dataset, with the nested fields kept typed
+        parquet_sink.write_batch(df_cleaned, df_raw)
+    if OUTPUT_FORMAT in ("csv", "both"):
+        # The first batch starts a fresh file, later ones append to it
+        df_cleaned.to_csv(OUTPUT_CSV, mode="w" if first_batch else "a", header=first_batch, index=False)
+
+    # Load data to database; rows whose detail page failed never overwrite a stored listing, and
+    # rows without a listing card keep the stored card fields
+    if len(df_cleaned):
+        load_data_to_db(df_cleaned, insert_only=~df_raw.loc[df_cleaned.index, 'detail_fetched'],
+                        keep_card=~df_raw.loc[df_cleaned.index, 'card_found'])
+    return len(df_cleaned)
+
+
+def process_listings(listings, concurrency, batch_size, job=None, on_flushed=None, first_batch=True, profiler=None):
+    """
+    Scrapes the detail page of every listing and flushes the rows in batches of `batch_size`.
+    `on_flushed(rows, loaded)` is called after each batch is loaded, only once it is stored: a
+    batch whose load fails raises out of here. Returns (scraped, loaded).
+
+    When run for a `job`, progress is reported on it, and a cancelled job stops after the
+    listing in hand, still loading the rows already scraped.
+    """
+    # Detail pages are fetched concurrently; results come back in listing order
+    details = scraper.scrape_detail_pages(listings, concurrency=concurrency, profiler=profiler)
+
+    batch = []
+    scraped = 0
+    loaded = 0
+
+    def flush():
+        nonlocal batch, loaded, first_batch
+        rows = flush_batch(batch, first_batch=first_batch, profiler=profiler)
+        loaded += rows
+        first_batch = False
+        if job:
+            job.add(rows_loaded=rows)
+        if on_flushed:
+            on_flushed(batch, rows)
+        batch = []
 
-app = FastAPI()
+    try:
+        for listing, detail in details:
+            scraped += 1
+            metrics.LISTINGS_SCRAPED.inc()
+            if job:
+                job.add(listings_done=1)
+            print(f"\n[{scraped}] Processed: {(listing['title'] or '')[:50]}...")
 
-def run_scraping_task(pages: int):
+            # Combine listing and detail data
+            row = {**listing, **detail}
+            row["models_flat"] = scraper.flatten_models(row.get("models"))
+            batch.append(row)
+
+            if len(batch) >= batch_size:
+                flush()
+
+            if job and job.cancelled:
+                print("🛑 Job cancelled, stopping after the current listing")
+                break
+    finally:
+        # Stop the detail fetchers right away instead of draining the rest of the listings
+        details.close()
+
+    if batch:
+        flush()
+    return scraped, loaded
+
+
+def run_scraping_task(pages: int, concurrency: int = scraper.SCRAPER_CONCURRENCY, incremental: bool = False,
+                      batch_size: int = SCRAPER_BATCH_SIZE, distributed: bool = False, profile: bool = False,
+                      job: jobs.Job = None):
     """
     A function that runs the scraping and processing logic.
+
+    Listings stream from the listing pages into the concurrent detail scraper, and the
+    resulting rows are cleaned, written to the CSV and loaded to the database every
+    `batch_size` rows, so memory stays flat and finished batches survive a crash.
+
+    With `distributed`, listings go through the shared Postgres crawl frontier instead, so
+    workers on other replicas (POST /scrape/worker) scrape them alongside this one.
+
+    Jobs keep a durable checkpoint (see checkpoint.py): if the process restarts midway, the
+    job is resumed under the same id from the first listing page not fully loaded, skipping
+    the listings already loaded.
+
+    With `profile` (or SCRAPER_PROFILE=1), the stages are profiled and the profiles are written
+    to PROFILE_DIR/<job_id>/ when the job ends.
     """
+    ckpt = checkpoint.CrawlCheckpoint(job.id, job.kwargs) if job and checkpoint.CHECKPOINTS_ENABLED else None
+    if ckpt and ckpt.resumed:
+        print(f"↩️ Resuming job {job.id} after listing page {ckpt.pages_done}, "
+              f"{len(ckpt.done_urls)} listings already loaded")
+        job.add(pages_done=ckpt.pages_done, listings_found=ckpt.listings_done,
+                listings_done=ckpt.listings_done, rows_loaded=ckpt.rows_flushed)
+
+    if job:
+        job.rate_limiter = rate_limit.limiter_for(scraper.BASE_URL)
+    profiler = start_profiler(profile, job)
+    status = jobs.FAILED
+    try:
+        if distributed:
+            run_distributed_task(pages, concurrency, incremental, batch_size, job, ckpt, profiler)
+        else:
+            run_local_task(pages, concurrency, incremental, batch_size, job, ckpt, profiler)
+        status = jobs.CANCELLED if job and job.cancelled else jobs.COMPLETED
+    finally:
+        if ckpt:
+            ckpt.finish(status)
+        finish_profiler(profiler, job)
+
+
+def start_profiler(profile, job):
+    """A JobProfiler when the job asked for one or SCRAPER_PROFILE is set, otherwise None"""
+    if not (profile or profiling.SCRAPER_PROFILE):
+        return None
+    return profiling.JobProfiler(job.id if job else uuid.uuid4().hex)
+
+
+def finish_profiler(profiler, job):
+    """Writes the job's profiles and records where they went"""
+    if profiler is None:
+        return
+    directory = profiler.write()
+    if job:
+        job.profile_dir = directory
+
+
+def run_local_task(pages, concurrency, incremental, batch_size, job=None, ckpt=None, profiler=None):
+    """Scrapes the listing pages and their detail pages on this process"""
     base_list_url = "https://www.encuentra24.com/panama-es/bienes-raices"
 
     print(f"🔍 Starting to scrape {pages} pages of listings...")
-    listings = scraper.scrape_main_listings(base_list_url, max_pages=pages)
-    print(f"Found {len(listings)} listings")
+    with report_cache_stats():
+        listings = iter_listings(base_list_url, pages, incremental, job, ckpt)
+        on_flushed = (lambda rows, loaded: ckpt.flushed([row["link"] for row in rows], loaded)) if ckpt else None
+        scraped, loaded = process_listings(listings, concurrency, batch_size, job, on_flushed=on_flushed,
+                                           first_batch=not (ckpt and ckpt.rows_flushed), profiler=profiler)
 
-    if not listings:
-        print("No listings found. Check the main listing scraper selectors.")
+    if not scraped:
+        if incremental:
+            print("Nothing new or changed since the last crawl.")
+        else:
+            print("No listings found. Check the main listing scraper selectors.")
         return
 
-    all_data = []
+    print(f"\n✅ Scraping and data loading complete! Loaded {loaded} records to '{scraper.TABLE_NAME}'")
 
-    for i, listing in enumerate(listings):
-        print(f"\n[{i + 1}/{len(listings)}] Processing: {listing['title'][:50]}...")
-        detail = scraper.scrape_detail_page(listing["link"])
 
-        # Combine listing and detail data
-        row = {**listing, **detail}
-        row["models_flat"] = scraper.flatten_models(row.get("models"))
-        all_data.append(row)
+def work_frontier(concurrency, batch_size, job=None, producer_done=None, profiler=None):
+    """
+    Claims, scrapes and loads frontier URLs one batch at a time until there is nothing left
+    to do: no pending or leased URLs, and the producer (when this worker has one) has finished
+    enqueueing. A worker without a producer also stops after FRONTIER_IDLE_EXIT seconds with
+    nothing to claim. Returns (scraped, loaded).
+    """
+    owner = f"{socket.gethostname()}-{os.getpid()}-{job.id if job else uuid.uuid4().hex}"
+    first_batch = not os.path.exists(OUTPUT_CSV)
+    scraped = loaded = 0
+    idle_since = None
+
+    while not (job and job.cancelled):
+        claimed = frontier.claim(owner, batch_size)
+        if not claimed:
+            open_urls = frontier.counts()
+            producing = producer_done is not None and not producer_done.is_set()
+            if not producing and not open_urls[frontier.PENDING] and not open_urls[frontier.LEASED]:
+                break
+            idle_since = idle_since or time.time()
+            if producer_done is None and time.time() - idle_since > frontier.FRONTIER_IDLE_EXIT:
+                break
+            time.sleep(frontier.FRONTIER_POLL_INTERVAL)
+            continue
+        idle_since = None
 
-        time.sleep(2)
+        in_hand = {listing["link"] for listing in claimed}
 
-    # Create DataFrame from scraped data
-    df_raw = pd.DataFrame(all_data)
+        def flushed(rows, _):
+            links = [row["link"] for row in rows]
+            # Rows without details failed to fetch: retry them later instead of marking them done
+            failed = [row["link"] for row in rows if "page_title" not in row]
+            frontier.fail(failed, owner, "detail page could not be fetched")
+            frontier.complete([link for link in links if link not in failed], owner)
+            in_hand.difference_update(links)
 
-    # Apply initial cleaning from original main.py
-    df_raw['title'] = df_raw['title'].fillna('').str.strip()
-    df_raw['link'] = df_raw['link'].fillna('').str.strip()
-    df_raw = df_raw[df_raw['link'].str.startswith('http')]
+        try:
+            batch_scraped, batch_loaded = process_listings(claimed, concurrency, batch_size, job,
+                                                           on_flushed=flushed, first_batch=first_batch,
+                                                           profiler=profiler)
+        except Exception as e:
+            # Claims not loaded because of an error (e.g. the database load failed) are retried later
+            frontier.fail(list(in_hand), owner, f"not loaded: {e}")
+            in_hand.clear()
+            raise
+        finally:
+            # Claims not loaded because the job was cancelled go back to the queue
+            frontier.release(list(in_hand), owner)
+        scraped += batch_scraped
+        loaded += batch_loaded
+        first_batch = False
+    return scraped, loaded
 
-    df_raw['price'] = df_raw['price'].apply(scraper.clean_price)
-    df_raw['area_m2'] = pd.to_numeric(df_raw['area_m2'], errors='coerce')
 
-    df_raw['bedrooms'] = df_raw['bedrooms'].apply(scraper.parse_int)
-    df_raw['bathrooms'] = df_raw['bathrooms'].apply(scraper.parse_int)
-    df_raw['parking'] = df_raw['parking'].apply(scraper.parse_int)
+def run_distributed_task(pages, concurrency, incremental, batch_size, job=None, ckpt=None, profiler=None):
+    """Enqueues the listing pages into the frontier while working it alongside the other replicas"""
+    base_list_url = "https://www.encuentra24.com/panama-es/bienes-raices"
+    producer_done = threading.Event()
+    start_page = ckpt.pages_done + 1 if ckpt else 1
 
-    if 'property_specs_raw' in df_raw.columns:
-        df_raw['bedrooms'] = df_raw.apply(lambda r: scraper.extract_numeric_from_specs(r, 'bedrooms', 'Bedrooms'),
-                                          axis=1).fillna(
-            df_raw['bedrooms'])
-        df_raw['bathrooms'] = df_raw.apply(lambda r: scraper.extract_numeric_from_specs(r, 'bathrooms', 'Bathrooms'),
-                                           axis=1).fillna(
-            df_raw['bathrooms'])
-        df_raw['parking'] = df_raw.apply(lambda r: scraper.extract_numeric_from_specs(r, 'parking', 'Parking'), axis=1).fillna(
-            df_raw['parking'])
+    def produce():
+        try:
+            for page, page_listings in scraper.iter_numbered_listing_pages(base_list_url, max_pages=pages,
+                                                                           start_page=start_page):
+                if incremental and page_listings:
+                    page_listings = scraper.filter_new_or_changed(page_listings)
+                queued = frontier.enqueue(page_listings)
+                print(f"Found {len(page_listings)} listings, {queued} queued in the crawl frontier")
+                if ckpt:
+                    # The frontier tracks the detail pages from here on
+                    ckpt.page_listed(page, [])
+                    ckpt.flushed([], 0)
+                if job:
+                    job.add(pages_done=1, listings_found=queued)
+                    if job.cancelled:
+                        return
+        finally:
+            producer_done.set()
 
-    for col in ['amenities', 'apartment_features', 'additional_benefits', 'models_flat', 'models']:
-        if col in df_raw.columns:
-            df_raw[col] = df_raw[col].apply(scraper.parse_list)
+    print(f"🔍 Enqueueing {pages} pages of listings into the crawl frontier...")
+    with report_cache_stats():
+        # The producer runs in this context, so its listing page fetches count towards the job too
+        producer = threading.Thread(target=contextvars.copy_context().run, args=(produce,),
+                                    name="frontier-producer", daemon=True)
+        producer.start()
+        scraped, loaded = work_frontier(concurrency, batch_size, job, producer_done, profiler)
+        producer.join()
 
-    df_raw['description'] = df_raw['description'].fillna('').str.strip()
-    df_raw['subtitle'] = df_raw['subtitle'].fillna('').str.strip()
-    df_raw['page_title'] = df_raw['page_title'].fillna('').str.strip()
+    print(f"\n✅ Frontier drained! This worker scraped {scraped} listings and loaded {loaded} records "
+          f"to '{scraper.TABLE_NAME}'")
 
-    # Call the new cleaning function
-    df_cleaned = scraper.clean_data(df_raw.copy())
-    df_cleaned.to_csv("encuentra24_final_cleaned.csv", index=False)
 
-    # Load data to database
-    scraper.load_data_to_db(df_cleaned)
+def run_frontier_worker(concurrency: int = scraper.SCRAPER_CONCURRENCY, batch_size: int = SCRAPER_BATCH_SIZE,
+                        profile: bool = False, job: jobs.Job = None):
+    """Joins a distributed crawl started on another replica, until the frontier is drained"""
+    if job:
+        job.rate_limiter = rate_limit.limiter_for(scraper.BASE_URL)
+    profiler = start_profiler(profile, job)
+    try:
+        with report_cache_stats():
+            scraped, loaded = work_frontier(concurrency, batch_size, job, profiler=profiler)
+    finally:
+        finish_profiler(profiler, job)
+    print(f"\n✅ Frontier worker done! Scraped {scraped} listings and loaded {loaded} records "
+          f"to '{scraper.TABLE_NAME}'")
+
 
-    print(f"\n✅ Scraping and data loading complete! Loaded {len(df_cleaned)} records to '{scraper.TABLE_NAME}'")
+def run_reparse_task(since: str = None, batch_size: int = SCRAPER_BATCH_SIZE, job: jobs.Job = None):
+    """
+    Rebuilds the rows of every archived listing from its latest archived pages, with the current
+    extraction code, and sends them through clean_data, the output files and the database load.
+    No page is fetched. Listing cards (title, price, location) come from the archived listing
+    pages, the rest from the detail pages, and each row keeps the time its page was fetched. A
+    detail page with no archived card keeps the stored title, price and location.
+    """
+    # Cards come from every archived listing page, whatever `since`: a listing page that was
+    # served from the response cache isn't archived again, yet its cards still apply
+    cards = {}
+    for _, fetched_at, page_listings in scraper.reparse_archived_pages(raw_archive.LISTING):
+        for listing in page_listings:
+            url = scraper.normalize_listing_url(listing["link"])
+            if url not in cards or fetched_at >= cards[url][0]:
+                cards[url] = (fetched_at, listing)
+    print(f"♻️ Re-parsing archived detail pages ({len(cards)} listing cards archived)...")
+
+    batch = []
+    first_batch = not os.path.exists(OUTPUT_CSV)
+    reparsed = loaded = 0
+    for url, fetched_at, detail in scraper.reparse_archived_pages(raw_archive.DETAIL, since):
+        # Without a card the row has no title, price or location: the load keeps the stored ones
+        _, card = cards.get(scraper.normalize_listing_url(url), (None, {}))
+        row = {**card, "link": url, **detail, "fetched_at": fetched_at}
+        row["models_flat"] = scraper.flatten_models(row.get("models"))
+        batch.append(row)
+        reparsed += 1
+        if job:
+            job.add(listings_found=1, listings_done=1)
+
+        if len(batch) >= batch_size:
+            rows = flush_batch(batch, first_batch)
+            loaded += rows
+            first_batch = False
+            batch = []
+            if job:
+                job.add(rows_loaded=rows)
+                if job.cancelled:
+                    break
+    if batch and not (job and job.cancelled):
+        rows = flush_batch(batch, first_batch)
+        loaded += rows
+        if job:
+            job.add(rows_loaded=rows)
+
+    print(f"\n✅ Re-parse complete! {reparsed} archived pages re-extracted, {loaded} records loaded "
+          f"to '{scraper.TABLE_NAME}'")
+
+
+def job_status(job):
+    """Status document of a job, with its place in line while it waits"""
+    status = job.snapshot()
+    if status["status"] == jobs.QUEUED:
+        status["queue_position"] = job_manager.queue_position(job)
+    return status
+
+
+def get_job_or_404(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
 
 
 @app.post("/scrape")
-async def scrape(request: ScrapeRequest, background_tasks: BackgroundTasks):
+async def scrape(request: ScrapeRequest):
+    """
+    Queues a job to scrape Encuentra24 listings. At most JOB_MAX_CONCURRENT jobs run at a
+    time; poll GET /scrape/{job_id} for its progress.
+    """
+    job = job_manager.submit(run_scraping_task, pages=request.pages, concurrency=request.concurrency,
+                             incremental=request.incremental, batch_size=request.batch_size,
+                             distributed=request.distributed, profile=request.profile)
+    return {
+        "message": f"Scraping for {request.pages} pages queued as job {job.id}.",
+        "job_id": job.id,
+        "status": job.status,
+    }
+
+
+@app.post("/scrape/worker")
+async def scrape_worker(request: FrontierWorkerRequest):
+    """
+    Queues a job that helps with a distributed crawl: it claims URLs from the crawl frontier,
+    scrapes and loads them, and finishes once the frontier is drained.
+    """
+    job = job_manager.submit(run_frontier_worker, concurrency=request.concurrency, batch_size=request.batch_size,
+                             profile=request.profile)
+    return {"message": f"Frontier worker queued as job {job.id}.", "job_id": job.id, "status": job.status}
+
+
+@app.post("/scrape/reparse")
+async def reparse(request: ReparseRequest):
+    """
+    Queues a job that re-extracts the listings from the raw page archive with the current
+    selectors and reloads them, without crawling the site again.
+    """
+    if not raw_archive.RAW_ARCHIVE_ENABLED:
+        raise HTTPException(status_code=409, detail="The raw page archive is disabled (RAW_ARCHIVE_ENABLED=0)")
+    job = job_manager.submit(run_reparse_task, since=request.since, batch_size=request.batch_size)
+    return {"message": f"Re-parse of the raw page archive queued as job {job.id}.", "job_id": job.id,
+            "status": job.status}
+
+
+@app.post("/scrape/{job_id}/resume")
+async def resume_scrape_job(job_id: str):
+    """Resumes a cancelled, failed or interrupted job from its checkpoint, under the same id"""
+    job = job_manager.get(job_id)
+    if job is not None and job.status not in jobs.FINISHED_STATES:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job.status}")
+    params = checkpoint.claim(job_id)
+    if params is None:
+        raise HTTPException(status_code=404, detail=f"No resumable checkpoint for job {job_id}")
+    job = job_manager.submit(run_scraping_task, job_id=job_id, **params)
+    return job_status(job)
+
+
+@app.get("/frontier")
+async def frontier_status():
+    """Number of crawl frontier URLs per status"""
+    return frontier.counts()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Crawl and load metrics in the Prometheus text format"""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/listings")
+def list_listings(min_price: Optional[float] = None, max_price: Optional[float] = None,
+                  min_area: Optional[float] = None, max_area: Optional[float] = None,
+                  bedrooms: Optional[int] = None, min_bedrooms: Optional[int] = None,
+                  max_bedrooms: Optional[int] = None, location: Optional[str] = None,
+                  amenity: Optional[list[str]] = Query(None), sort: str = "scraped_at", order: str = "desc",
+                  limit: int = 50, cursor: Optional[str] = None, include_attributes: bool = False):
     """
-    Starts a background task to scrape Encuentra24 listings.
+    Stored listings matching the filters (amenity can be repeated; all must match), one page at
+    a time: pass the returned next_cursor to get the following page. Plain def, so the query
+    runs on the threadpool instead of blocking the event loop.
     """
-    background_tasks.add_task(run_scraping_task, request.pages)
-    return {"message": f"Scraping for {request.pages} pages initiated in the background."}
+    filters = {"min_price": min_price, "max_price": max_price, "min_area": min_area, "max_area": max_area,
+               "bedrooms": bedrooms, "min_bedrooms": min_bedrooms, "max_bedrooms": max_bedrooms,
+               "location": location, "amenities": amenity}
+    try:
+        return listings.query_listings(filters, sort=sort, order=order, limit=limit, cursor=cursor,
+                                       include_attributes=include_attributes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/selectors")
+def selector_hit_rates():
+    """Tries, hits and hit rate of every fallback selector by field, in the order they are tried"""
+    return selector_stats.stats()
+
+
+@app.get("/scrape")
+async def list_scrape_jobs():
+    """Lists the known jobs, newest first"""
+    return [job_status(job) for job in sorted(job_manager.list(), key=lambda j: j.created_at, reverse=True)]
+
+
+@app.get("/scrape/{job_id}")
+async def get_scrape_job(job_id: str):
+    """Status of a job: pages and listings done, rows loaded, rows/sec, ETA and request rate"""
+    return job_status(get_job_or_404(job_id))
+
+
+@app.delete("/scrape/{job_id}")
+async def cancel_scrape_job(job_id: str):
+    """Cancels a job; a running one stops after the listing in hand and keeps the rows already loaded"""
+    job = get_job_or_404(job_id)
+    if job.status in jobs.FINISHED_STATES:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} already {job.status}")
+    job_manager.cancel(job_id)
+    return job_status(job)
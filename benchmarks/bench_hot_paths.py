@@ -0,0 +1,213 @@
+"""
+Offline micro-benchmarks for the extraction and cleaning hot paths.
+
+    python benchmarks/bench_hot_paths.py [--repeat N] [--only NAME ...] [--save-baseline]
+
+Every benchmark runs on the saved pages in benchmarks/corpus (listing_*.html and detail_*.html),
+with no network access: scrape_detail_page is served the saved bytes instead of fetching.
+For each function it reports the time per call (best of --repeat samples over the corpus) and
+the memory it allocates per call (mean tracemalloc peak), and compares both with the stored
+baseline. Anything slower (still, when timed a second time) or allocating more than the
+tolerance is flagged and the script exits with status 1, so it can gate a change.
+
+The baseline is machine-specific: after changing machines, or after accepting a change on
+purpose, refresh it with --save-baseline.
+"""
+import argparse
+import contextlib
+import gc
+import glob
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Benchmark runs keep their selector counts out of the crawl statistics
+os.environ.setdefault("SELECTOR_STATS_PATH", ":memory:")
+
+import scraper
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BENCH_DIR, "corpus")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+# Rows in the frame clean_data is timed on, built by cycling through the corpus rows
+CLEAN_ROWS = 500
+# Quick functions run several passes per timed sample so timer noise stays small
+MIN_SAMPLE_SECONDS = 0.1
+
+
+def load_pages(prefix):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, f"{prefix}_*.html"))):
+        with open(path, "rb") as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+
+def detail_url(name):
+    return f"{scraper.BASE_URL}/panama-es/bienes-raices/corpus/{name}"
+
+
+def build_cases():
+    """Returns [(name, function, inputs)]: each function is called once per input, as fn(*input)"""
+    listing_pages = load_pages("listing")
+    detail_pages = load_pages("detail")
+    if not listing_pages or not detail_pages:
+        sys.exit(f"No listing_*.html / detail_*.html pages in {CORPUS_DIR}")
+
+    # scrape_detail_page reads the saved page instead of the network, and skips the response cache
+    saved = {detail_url(name): content for name, content in detail_pages}
+    scraper.fetch_content = lambda url, saved=saved: (saved[url], False)
+    scraper.get_response_cache = lambda: None
+
+    soups = [scraper.parse_html(content) for _, content in detail_pages]
+    details = [scraper.parse_detail_content(content) for _, content in detail_pages]
+    listings = [listing for _, content in listing_pages for listing in scraper.parse_listing_page(content)]
+
+    rows = []
+    for i, listing in enumerate(listings):
+        row = {**listing, **details[i % len(details)]}
+        row["models_flat"] = scraper.flatten_models(row.get("models"))
+        rows.append(row)
+    rows = [rows[i % len(rows)] for i in range(CLEAN_ROWS)]
+    raw_frame = scraper.prepare_raw_frame(rows)
+
+    # parse_list sees both lists (fresh rows) and their string form (rows read back from CSV)
+    list_values = [detail[col] for detail in details
+                   for col in ("amenities", "apartment_features", "additional_benefits", "property_specs_raw")]
+    list_values += [str(value) for value in list_values]
+
+    return [
+        ("parse_listing_page", scraper.parse_listing_page, [(content,) for _, content in listing_pages]),
+        ("scrape_detail_page", scraper.scrape_detail_page, [(detail_url(name),) for name, _ in detail_pages]),
+        ("extract_property_specs", scraper.extract_property_specs, [(soup,) for soup in soups]),
+        ("extract_models_enhanced", scraper.extract_models_enhanced, [(soup,) for soup in soups]),
+        ("flatten_models", scraper.flatten_models, [(detail["models"],) for detail in details]),
+        ("parse_list", scraper.parse_list, [(value,) for value in list_values]),
+        ("clean_data", lambda frame: scraper.clean_data(frame.copy()), [(raw_frame,)]),
+    ]
+
+
+def time_per_call(fn, inputs, repeat):
+    """Best time per call over `repeat` samples"""
+    def run_passes(passes):
+        start = time.perf_counter()
+        for _ in range(passes):
+            for args in inputs:
+                fn(*args)
+        return time.perf_counter() - start
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        first = run_passes(1)  # Also warms up caches (regexes, selectors) before timing
+        passes = max(1, math.ceil(MIN_SAMPLE_SECONDS / first)) if first > 0 else 1
+        return min(run_passes(passes) for _ in range(repeat)) / passes / len(inputs)
+
+
+def peak_per_call(fn, inputs):
+    """Mean tracemalloc peak per call, in bytes"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        # The cyclic GC would free parse trees at arbitrary points of a call; keep it out so the
+        # allocation figure is the same from run to run
+        peaks = 0
+        tracemalloc.start()
+        gc.disable()
+        try:
+            for args in inputs:
+                gc.collect()
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                fn(*args)
+                peaks += tracemalloc.get_traced_memory()[1] - before
+        finally:
+            gc.enable()
+            tracemalloc.stop()
+    return peaks / len(inputs)
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return None
+    with open(BASELINE_PATH) as f:
+        return json.load(f)
+
+
+def environment():
+    return {"python": platform.python_version(), "machine": platform.machine(), "parser": scraper.HTML_PARSER,
+            "listing_parser": scraper.LISTING_PARSER}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="run only these benchmarks")
+    parser.add_argument("--time-tolerance", type=float, default=0.20,
+                        help="flag benchmarks this much slower than the baseline (default 0.20 = 20%%)")
+    parser.add_argument("--alloc-tolerance", type=float, default=0.10,
+                        help="flag benchmarks allocating this much more than the baseline (default 0.10)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args()
+
+    cases = build_cases()
+    if args.only:
+        unknown = set(args.only) - {name for name, _, _ in cases}
+        if unknown:
+            sys.exit(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+        cases = [case for case in cases if case[0] in args.only]
+
+    baseline = load_baseline()
+    reference = baseline["results"] if baseline and not args.save_baseline else {}
+    if baseline and not args.save_baseline and baseline.get("environment") != environment():
+        print(f"Warning: baseline was recorded on {baseline.get('environment')}, this is {environment()}")
+
+    print(f"{'benchmark':<26}{'calls':>6}{'ms/call':>11}{'vs base':>9}{'KiB/call':>11}{'vs base':>9}")
+    results = {}
+    regressions = []
+    for name, fn, inputs in cases:
+        base = reference.get(name)
+        seconds = time_per_call(fn, inputs, args.repeat)
+        if base and seconds * 1000 > base["ms_per_call"] * (1 + args.time_tolerance):
+            # Confirm before flagging: a busy machine slows single samples down
+            seconds = min(seconds, time_per_call(fn, inputs, args.repeat))
+        peak = peak_per_call(fn, inputs)
+        results[name] = {"ms_per_call": round(seconds * 1000, 4), "kib_per_call": round(peak / 1024, 2)}
+
+        line = f"{name:<26}{len(inputs):>6}{seconds * 1000:>11.3f}"
+        if base:
+            time_ratio = results[name]["ms_per_call"] / base["ms_per_call"] if base["ms_per_call"] else 1.0
+            alloc_ratio = results[name]["kib_per_call"] / base["kib_per_call"] if base["kib_per_call"] else 1.0
+            line += f"{time_ratio:>8.2f}x{peak / 1024:>11.1f}{alloc_ratio:>8.2f}x"
+            flags = []
+            if time_ratio > 1 + args.time_tolerance:
+                flags.append("SLOWER")
+            if alloc_ratio > 1 + args.alloc_tolerance:
+                flags.append("MORE MEMORY")
+            if flags:
+                regressions.append(name)
+                line += "  " + ", ".join(flags)
+        else:
+            line += f"{'-':>9}{peak / 1024:>11.1f}{'-':>9}"
+        print(line)
+
+    if args.save_baseline:
+        merged = dict(baseline["results"]) if baseline else {}
+        merged.update(results)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({"environment": environment(), "repeat": args.repeat, "results": merged}, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline saved to {BASELINE_PATH}")
+    elif regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+    elif baseline:
+        print("\nNo regressions against the baseline")
+    else:
+        print("\nNo baseline yet, store one with --save-baseline")
+
+
+if __name__ == "__main__":
+    main()
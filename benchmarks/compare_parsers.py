@@ -0,0 +1,104 @@
+"""
+Compares the HTML parser backends on a saved page corpus.
+
+    python benchmarks/compare_parsers.py [corpus_dir] [--repeat N]
+
+corpus_dir holds saved pages named listing_*.html and detail_*.html. Each backend parses and
+extracts every page, its output is compared with the reference html.parser output, and the
+fastest backend giving identical results is reported for LISTING_PARSER and HTML_PARSER.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4.builder import builder_registry
+
+import scraper
+
+REFERENCE = "html.parser"
+
+
+def load_pages(corpus_dir, prefix):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, f"{prefix}_*.html"))):
+        with open(path, "rb") as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+
+def normalize(value):
+    """Sorts lists of strings, which come out of set() in no particular order"""
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        items = [normalize(v) for v in value]
+        if all(isinstance(v, str) for v in items):
+            return sorted(items)
+        return items
+    return value
+
+
+def run_backend(pages, extract, repeat):
+    """Returns (seconds per page, normalized outputs) for one backend"""
+    outputs = [normalize(extract(content)) for _, content in pages]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, content in pages:
+            extract(content)
+    return (time.perf_counter() - start) / (repeat * len(pages)), outputs
+
+
+def compare(label, pages, backends, repeat):
+    """Times every backend on `pages` and returns the fastest one matching the reference output"""
+    if not pages:
+        print(f"No {label} pages in corpus, skipping")
+        return None
+
+    print(f"\n{label} pages ({len(pages)})")
+    reference = None
+    best = None
+    for name, extract in backends:
+        per_page, outputs = run_backend(pages, extract, repeat)
+        if reference is None:
+            reference = outputs
+        mismatches = [page for (page, _), out, ref in zip(pages, outputs, reference) if out != ref]
+        status = "identical" if not mismatches else f"DIFFERS on {len(mismatches)}: {', '.join(mismatches[:3])}"
+        print(f"  {name:<12} {per_page * 1000:8.2f} ms/page  {status}")
+        if not mismatches and (best is None or per_page < best[1]):
+            best = (name, per_page)
+    return best[0] if best else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus_dir", nargs="?", default=os.path.join(os.path.dirname(__file__), "corpus"))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tree_builders = [name for name in (REFERENCE, "lxml", "html5lib") if builder_registry.lookup(name)]
+
+    listing_backends = [(name, lambda content, name=name: scraper.parse_listing_page(content, name))
+                        for name in tree_builders]
+    if scraper.LexborHTMLParser is not None:
+        listing_backends.append(("selectolax", lambda content: scraper.parse_listing_page(content, "selectolax")))
+
+    detail_backends = [(name, lambda content, name=name: scraper.extract_detail_page(scraper.parse_html(content, name)))
+                       for name in tree_builders]
+
+    best_listing = compare("Listing", load_pages(args.corpus_dir, "listing"), listing_backends, args.repeat)
+    best_detail = compare("Detail", load_pages(args.corpus_dir, "detail"), detail_backends, args.repeat)
+
+    print()
+    if best_listing:
+        print(f"LISTING_PARSER={'selectolax' if best_listing == 'selectolax' else 'bs4'}"
+              f"{'' if best_listing in ('selectolax', REFERENCE) else f'  (with HTML_PARSER={best_listing})'}")
+    if best_detail:
+        print(f"HTML_PARSER={best_detail}")
+
+
+if __name__ == "__main__":
+    main()
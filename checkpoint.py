@@ -0,0 +1,199 @@
+import json
+import os
+import socket
+import threading
+
+import psycopg2.extras
+
+import scraper
+
+CHECKPOINTS_ENABLED = os.getenv("CHECKPOINTS_ENABLED", "1") == "1"
+CHECKPOINT_HEARTBEAT = float(os.getenv("CHECKPOINT_HEARTBEAT", "30"))  # Seconds between liveness updates
+CHECKPOINT_STALE_AFTER = float(os.getenv("CHECKPOINT_STALE_AFTER", "120"))  # Silent this long = process died
+
+CHECKPOINT_TABLE = "public.crawl_checkpoint"
+CHECKPOINT_URL_TABLE = "public.crawl_checkpoint_url"
+
+RUNNING = "running"
+
+# Identifies this process as the holder of the checkpoints of the jobs it runs
+OWNER = f"{socket.gethostname()}-{os.getpid()}"
+
+_table_ready = False
+_table_lock = threading.Lock()
+_held = set()
+_held_lock = threading.Lock()
+
+
+def create_checkpoint_tables_if_not_exists(cur):
+    """Creates the checkpoint tables: one row per job, plus the detail URLs it has flushed"""
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+        job_id TEXT PRIMARY KEY,
+        params JSONB NOT NULL,
+        status TEXT NOT NULL,
+        owner TEXT,
+        pages_done INTEGER NOT NULL DEFAULT 0,
+        listings_done INTEGER NOT NULL DEFAULT 0,
+        rows_flushed INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+    );
+    """)
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {CHECKPOINT_URL_TABLE} (
+        job_id TEXT NOT NULL REFERENCES {CHECKPOINT_TABLE} (job_id) ON DELETE CASCADE,
+        url TEXT NOT NULL,
+        PRIMARY KEY (job_id, url)
+    );
+    """)
+
+
+def checkpoint_connection():
+    """Opens a database connection, creating the checkpoint tables on first use"""
+    global _table_ready
+    conn = scraper.get_db_connection()
+    if not _table_ready:
+        with _table_lock:
+            if not _table_ready:
+                with conn.cursor() as cur:
+                    create_checkpoint_tables_if_not_exists(cur)
+                conn.commit()
+                _table_ready = True
+    return conn
+
+
+def _execute(query, params=(), fetch=False):
+    conn = checkpoint_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall() if fetch else None
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+def _hold(job_id):
+    with _held_lock:
+        _held.add(job_id)
+
+
+def _release(job_id):
+    with _held_lock:
+        _held.discard(job_id)
+
+
+def heartbeat():
+    """Marks the checkpoints held by this process (queued or running) as alive"""
+    with _held_lock:
+        job_ids = list(_held)
+    if job_ids:
+        _execute(f"UPDATE {CHECKPOINT_TABLE} SET updated_at = now() WHERE job_id = ANY(%s) AND owner = %s",
+                 (job_ids, OWNER))
+
+
+def claim_stale():
+    """
+    Takes over running checkpoints whose owner stopped sending heartbeats (the process was
+    restarted or died) and returns their (job_id, params) so they can be resumed here. The
+    UPDATE only succeeds for one claimant, so a job is never resumed twice.
+    """
+    rows = _execute(f"""
+        UPDATE {CHECKPOINT_TABLE} SET owner = %s, updated_at = now()
+        WHERE status = '{RUNNING}' AND updated_at < now() - make_interval(secs => %s)
+        RETURNING job_id, params
+    """, (OWNER, CHECKPOINT_STALE_AFTER), fetch=True)
+    for job_id, _ in rows:
+        _hold(job_id)
+    return rows
+
+
+def claim(job_id):
+    """
+    Takes over one checkpoint to resume it by hand: allowed when it was cancelled or failed,
+    or when it is still marked running but its owner went silent. Returns its params or None.
+    """
+    rows = _execute(f"""
+        UPDATE {CHECKPOINT_TABLE} SET owner = %s, status = '{RUNNING}', updated_at = now()
+        WHERE job_id = %s AND status <> 'completed'
+          AND (status <> '{RUNNING}' OR updated_at < now() - make_interval(secs => %s))
+        RETURNING params
+    """, (OWNER, job_id, CHECKPOINT_STALE_AFTER), fetch=True)
+    if not rows:
+        return None
+    _hold(job_id)
+    return rows[0][0]
+
+
+class CrawlCheckpoint:
+    """
+    Durable progress of one crawl job: the last listing page whose listings are all loaded,
+    the detail URLs already loaded and the rows flushed. Opening the checkpoint of a job
+    that ran before returns where it stopped, so the crawl continues from there.
+    """
+
+    def __init__(self, job_id, params):
+        self.job_id = job_id
+        rows = _execute(f"""
+            INSERT INTO {CHECKPOINT_TABLE} (job_id, params, status, owner) VALUES (%s, %s, '{RUNNING}', %s)
+            ON CONFLICT (job_id) DO UPDATE SET status = '{RUNNING}', owner = EXCLUDED.owner, updated_at = now()
+            RETURNING pages_done, listings_done, rows_flushed
+        """, (job_id, json.dumps(params), OWNER), fetch=True)
+        self.pages_done, self.listings_done, self.rows_flushed = rows[0]
+        self.done_urls = {url for url, in _execute(
+            f"SELECT url FROM {CHECKPOINT_URL_TABLE} WHERE job_id = %s", (job_id,), fetch=True)}
+        _hold(job_id)
+
+        # Listings of the pages listed but not fully loaded yet, by page
+        self._open_pages = {}
+
+    @property
+    def resumed(self):
+        return bool(self.pages_done or self.done_urls)
+
+    def page_listed(self, page, links):
+        """Records the listings of a listing page that still need loading"""
+        self._open_pages[page] = {link for link in links if link not in self.done_urls}
+        self._advance()
+
+    def flushed(self, links, rows):
+        """Persists a loaded batch: its URLs, the row count and any listing page now finished"""
+        links = [link for link in links if link not in self.done_urls]
+        self.done_urls.update(links)
+        for remaining in self._open_pages.values():
+            remaining.difference_update(links)
+        self._advance()
+
+        conn = checkpoint_connection()
+        try:
+            with conn.cursor() as cur:
+                if links:
+                    psycopg2.extras.execute_values(
+                        cur, f"INSERT INTO {CHECKPOINT_URL_TABLE} (job_id, url) VALUES %s ON CONFLICT DO NOTHING",
+                        [(self.job_id, link) for link in links])
+                cur.execute(f"""
+                    UPDATE {CHECKPOINT_TABLE} SET pages_done = GREATEST(pages_done, %s),
+                        listings_done = listings_done + %s, rows_flushed = rows_flushed + %s, updated_at = now()
+                    WHERE job_id = %s
+                """, (self.pages_done, len(links), rows, self.job_id))
+            conn.commit()
+        finally:
+            conn.close()
+        self.listings_done += len(links)
+        self.rows_flushed += rows
+
+    def _advance(self):
+        """Moves pages_done past every listed page whose listings are all loaded, in page order"""
+        for page in sorted(self._open_pages):
+            if self._open_pages[page]:
+                break
+            del self._open_pages[page]
+            self.pages_done = max(self.pages_done, page)
+
+    def finish(self, status):
+        """Marks the job completed, cancelled or failed and stops holding it"""
+        _execute(f"UPDATE {CHECKPOINT_TABLE} SET status = %s, updated_at = now() WHERE job_id = %s",
+                 (status, self.job_id))
+        _release(self.job_id)
@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+
+import psycopg2.extras
+
+import scraper
+
+FRONTIER_TABLE = "public.crawl_frontier"
+FRONTIER_LEASE_SECONDS = int(os.getenv("FRONTIER_LEASE_SECONDS", "300"))  # A claim not completed by then goes back in line
+FRONTIER_MAX_ATTEMPTS = int(os.getenv("FRONTIER_MAX_ATTEMPTS", "3"))
+FRONTIER_RECRAWL_AFTER = int(os.getenv("FRONTIER_RECRAWL_AFTER", "21600"))  # Seconds before a done URL can be queued again
+FRONTIER_POLL_INTERVAL = float(os.getenv("FRONTIER_POLL_INTERVAL", "2"))
+FRONTIER_IDLE_EXIT = float(os.getenv("FRONTIER_IDLE_EXIT", "30"))  # Workers with nothing to claim for this long stop
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_table_ready = False
+_table_lock = threading.Lock()
+
+
+def create_frontier_table_if_not_exists(cur):
+    """Creates the frontier table: one row per normalized listing URL"""
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {FRONTIER_TABLE} (
+        url TEXT PRIMARY KEY,
+        listing JSONB NOT NULL,
+        status TEXT NOT NULL DEFAULT '{PENDING}',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        lease_owner TEXT,
+        lease_expires_at TIMESTAMP WITH TIME ZONE,
+        enqueued_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        finished_at TIMESTAMP WITH TIME ZONE,
+        last_error TEXT
+    );
+    """)
+    # Claims scan the open rows oldest first
+    cur.execute(f"""
+    CREATE INDEX IF NOT EXISTS crawl_frontier_claim_idx ON {FRONTIER_TABLE} (enqueued_at)
+    WHERE status IN ('{PENDING}', '{LEASED}');
+    """)
+
+
+def frontier_connection():
+    """Opens a database connection, creating the frontier table on first use"""
+    global _table_ready
+    conn = scraper.get_db_connection()
+    if not _table_ready:
+        with _table_lock:
+            if not _table_ready:
+                with conn.cursor() as cur:
+                    create_frontier_table_if_not_exists(cur)
+                conn.commit()
+                _table_ready = True
+    return conn
+
+
+def enqueue(listings):
+    """
+    Adds listings (as produced by the listing page scraper) to the frontier and returns how
+    many were queued. A URL already pending or leased is left alone, and a finished one is
+    only queued again once it is FRONTIER_RECRAWL_AFTER seconds old or its card changed, so
+    replicas enqueueing the same pages never scrape a listing twice.
+    """
+    by_url = {}
+    for listing in listings:
+        if listing.get("link"):
+            by_url[scraper.normalize_listing_url(listing["link"])] = listing
+    if not by_url:
+        return 0
+
+    conn = frontier_connection()
+    try:
+        with conn.cursor() as cur:
+            queued = psycopg2.extras.execute_values(cur, f"""
+                INSERT INTO {FRONTIER_TABLE} AS f (url, listing) VALUES %s
+                ON CONFLICT (url) DO UPDATE SET
+                    listing = EXCLUDED.listing, status = '{PENDING}', attempts = 0, lease_owner = NULL,
+                    lease_expires_at = NULL, enqueued_at = now(), finished_at = NULL, last_error = NULL
+                WHERE f.status IN ('{DONE}', '{FAILED}')
+                  AND (f.finished_at < now() - make_interval(secs => {int(FRONTIER_RECRAWL_AFTER)})
+                       OR f.listing->>'card_fingerprint' IS DISTINCT FROM EXCLUDED.listing->>'card_fingerprint')
+                RETURNING url
+            """, [(url, json.dumps(listing)) for url, listing in by_url.items()], fetch=True)
+        conn.commit()
+        return len(queued)
+    finally:
+        conn.close()
+
+
+def claim(owner, limit):
+    """
+    Leases up to `limit` URLs to `owner` and returns their listings. Rows locked by another
+    worker's claim are skipped rather than waited on, so workers never get the same URL.
+    Expired leases are claimable again until a URL runs out of attempts.
+    """
+    conn = frontier_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                UPDATE {FRONTIER_TABLE} SET status = '{FAILED}', last_error = 'lease expired', finished_at = now()
+                WHERE status = '{LEASED}' AND lease_expires_at < now() AND attempts >= %s
+            """, (FRONTIER_MAX_ATTEMPTS,))
+            cur.execute(f"""
+                WITH claimable AS (
+                    SELECT url FROM {FRONTIER_TABLE}
+                    WHERE status = '{PENDING}' OR (status = '{LEASED}' AND lease_expires_at < now())
+                    ORDER BY enqueued_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE {FRONTIER_TABLE} AS f SET
+                    status = '{LEASED}', lease_owner = %s, attempts = f.attempts + 1,
+                    lease_expires_at = now() + make_interval(secs => %s)
+                FROM claimable WHERE f.url = claimable.url
+                RETURNING f.listing
+            """, (limit, owner, FRONTIER_LEASE_SECONDS))
+            listings = [row[0] for row in cur.fetchall()]
+        conn.commit()
+        return listings
+    finally:
+        conn.close()
+
+
+def _leased_update(links, owner, assignments, params=()):
+    """Applies `assignments` to the given URLs still leased by `owner`"""
+    if not links:
+        return
+    urls = [scraper.normalize_listing_url(link) for link in links]
+    conn = frontier_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                UPDATE {FRONTIER_TABLE} SET {assignments}, lease_owner = NULL, lease_expires_at = NULL
+                WHERE url = ANY(%s) AND lease_owner = %s AND status = '{LEASED}'
+            """, (*params, urls, owner))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def complete(links, owner):
+    """Marks URLs as scraped and loaded"""
+    _leased_update(links, owner, f"status = '{DONE}', finished_at = now(), last_error = NULL")
+
+
+def fail(links, owner, error):
+    """Returns URLs whose scrape failed to the queue, or gives up on them after FRONTIER_MAX_ATTEMPTS"""
+    _leased_update(
+        links, owner,
+        f"status = CASE WHEN attempts >= %s THEN '{FAILED}' ELSE '{PENDING}' END, "
+        f"finished_at = CASE WHEN attempts >= %s THEN now() END, last_error = %s",
+        (FRONTIER_MAX_ATTEMPTS, FRONTIER_MAX_ATTEMPTS, error)
+    )
+
+
+def release(links, owner):
+    """Hands unprocessed claims back (e.g. on cancellation) without using up an attempt"""
+    _leased_update(links, owner, f"status = '{PENDING}', attempts = GREATEST(attempts - 1, 0)")
+
+
+def counts():
+    """Number of frontier rows per status"""
+    conn = frontier_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT status, count(*) FROM {FRONTIER_TABLE} GROUP BY status")
+            found = dict(cur.fetchall())
+        conn.commit()
+    finally:
+        conn.close()
+    return {status: found.get(status, 0) for status in (PENDING, LEASED, DONE, FAILED)}
@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") == "1"
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", ".cache/http_cache.sqlite")
+HTTP_CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", "21600"))  # Seconds an entry is served without revalidation
+HTTP_CACHE_MAX_MB = float(os.getenv("HTTP_CACHE_MAX_MB", "512"))
+
+
+class ResponseCache:
+    """
+    SQLite-backed HTTP response cache keyed by URL.
+
+    Entries younger than `ttl` are served as-is. Older entries are revalidated with
+    If-None-Match / If-Modified-Since; a 304 refreshes the entry and keeps its body and any
+    parsed result stored alongside it. A parsed result is tagged with the version of the
+    extraction code that produced it and only served back to that version. When the stored
+    bodies exceed `max_bytes` the least recently used entries are evicted.
+    """
+
+    def __init__(self, path=HTTP_CACHE_PATH, ttl=HTTP_CACHE_TTL, max_bytes=int(HTTP_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                parsed TEXT,
+                parsed_version TEXT
+            )
+        """)
+        if "parsed_version" not in {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}:
+            # Caches created before parsed results were versioned: their results never match a version
+            self._conn.execute("ALTER TABLE responses ADD COLUMN parsed_version TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url):
+        """Returns the cached entry for `url` as a dict (with a `fresh` flag), or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url))
+
+        body, etag, last_modified, fetched_at = row
+        return {
+            "content": zlib.decompress(body),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": now - fetched_at < self.ttl,
+        }
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Builds the revalidation headers for a stale entry"""
+        conditional = {}
+        if entry.get("etag"):
+            conditional["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            conditional["If-Modified-Since"] = entry["last_modified"]
+        return conditional
+
+    def put(self, url, content, etag=None, last_modified=None):
+        """Stores a freshly downloaded body, dropping any parsed result kept for the old one"""
+        body = zlib.compress(content)
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, body, etag, last_modified, fetched_at, accessed_at, size, "
+                "parsed, parsed_version) VALUES (?, ?, ?, ?, ?, ?, ?, NULL, NULL)",
+                (url, body, etag, last_modified, now, now, len(body))
+            )
+            self._total_bytes += len(body) - (previous[0] if previous else 0)
+            self._evict()
+
+    def revalidated(self, url):
+        """Marks an entry as fresh again after the server answered 304 Not Modified"""
+        with self._lock:
+            self._conn.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    def get_parsed(self, url, version):
+        """Returns the extraction result stored for the cached body if `version` of the extraction code made it, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT parsed, parsed_version FROM responses WHERE url = ?", (url,)).fetchone()
+        if row is None or row[0] is None or row[1] != version:
+            return None
+        return json.loads(row[0])
+
+    def put_parsed(self, url, parsed, version):
+        """Stores the extraction result for the body currently cached under `url`, made by `version`"""
+        with self._lock:
+            self._conn.execute("UPDATE responses SET parsed = ?, parsed_version = ? WHERE url = ?",
+                               (json.dumps(parsed), version, url))
+
+    def _evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes (caller holds the lock)"""
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT url, size FROM responses ORDER BY accessed_at LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for url, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self._total_bytes -= size
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,202 @@
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+
+JOB_MAX_CONCURRENT = int(os.getenv("JOB_MAX_CONCURRENT", "1"))  # Crawls running at once; the rest wait in line
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "100"))  # Finished jobs kept around for status queries
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = {COMPLETED, FAILED, CANCELLED}
+
+
+class Job:
+    """
+    One scraping run: its parameters, state and progress counters.
+
+    The task updates the counters as it goes and polls `cancelled` between units of work;
+    `snapshot()` turns them into the status document served by the API.
+    """
+
+    def __init__(self, target, args, kwargs, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        self.pages_total = kwargs.get("pages")
+        self.pages_done = 0
+        self.listings_found = 0
+        self.listings_done = 0
+        self.rows_loaded = 0
+        self.profile_dir = None  # Where the job's profiles were written, when it was profiled
+        self.rate_limiter = None  # rate_limit.AdaptiveRateLimiter pacing the job's requests, if it crawls
+        self.request_rate = None  # Its last snapshot, kept once the job has finished
+
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def add(self, **counters):
+        """Increments progress counters, e.g. job.add(listings_done=1)"""
+        with self._lock:
+            for name, amount in counters.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def snapshot(self):
+        """Status, progress, throughput and ETA as a JSON-serializable dict"""
+        with self._lock:
+            now = self.finished_at or time.time()
+            elapsed = now - self.started_at if self.started_at else 0.0
+            rows_per_sec = self.rows_loaded / elapsed if elapsed > 0 else 0.0
+            listings_per_sec = self.listings_done / elapsed if elapsed > 0 else 0.0
+
+            # Listings still to go, extrapolating the listings per page seen so far to the pages left
+            eta_seconds = None
+            if self.status == RUNNING and self.pages_done and listings_per_sec > 0:
+                expected = self.listings_found
+                if self.pages_total:
+                    expected = self.listings_found / self.pages_done * max(self.pages_total, self.pages_done)
+                eta_seconds = round(max(expected - self.listings_done, 0) / listings_per_sec, 1)
+
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "error": self.error,
+                "params": self.kwargs,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "pages_total": self.pages_total,
+                "pages_done": self.pages_done,
+                "listings_found": self.listings_found,
+                "listings_done": self.listings_done,
+                "rows_loaded": self.rows_loaded,
+                "elapsed_seconds": round(elapsed, 1),
+                "rows_per_sec": round(rows_per_sec, 2),
+                "eta_seconds": eta_seconds,
+                "profile_dir": self.profile_dir,
+                "request_rate": self.rate_limiter.snapshot() if self.rate_limiter and self.status == RUNNING
+                else self.request_rate,
+            }
+
+
+class JobManager:
+    """
+    Runs submitted jobs on `max_concurrent` worker threads. Jobs beyond that wait in a FIFO
+    queue, so overlapping requests line up instead of crawling the site and loading the
+    database at the same time.
+    """
+
+    def __init__(self, max_concurrent=JOB_MAX_CONCURRENT, history=JOB_HISTORY):
+        self.max_concurrent = max(1, max_concurrent)
+        self.history = history
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def submit(self, target, *args, job_id=None, **kwargs):
+        """
+        Queues `target(*args, job=job, **kwargs)` and returns its Job. `job_id` reuses the id
+        of an earlier job, e.g. one resumed from its checkpoint.
+        """
+        with self._lock:
+            existing = self._jobs.get(job_id)
+            if existing is not None and existing.status not in FINISHED_STATES:
+                return existing
+        job = Job(target, args, kwargs, job_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+            self._start_workers()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Asks a job to stop. Queued jobs never start; running ones stop at their next check"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel()
+        with job._lock:
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+        return job
+
+    def queue_position(self, job):
+        """1-based place of a queued job in line, None once it left the queue"""
+        with self._lock:
+            queued = [j for j in self._jobs.values() if j.status == QUEUED]
+        queued.sort(key=lambda j: j.created_at)
+        return queued.index(job) + 1 if job in queued else None
+
+    def _start_workers(self):
+        """Starts the worker threads on first use (caller holds the lock)"""
+        while len(self._workers) < self.max_concurrent:
+            worker = threading.Thread(target=self._work, name=f"job-worker-{len(self._workers)}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        with job._lock:
+            if job.status != QUEUED:  # Cancelled while waiting
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+
+        print(f"Job {job.id} started")
+        try:
+            job.target(*job.args, job=job, **job.kwargs)
+            status = CANCELLED if job.cancelled else COMPLETED
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            status = FAILED
+
+        request_rate = job.rate_limiter.snapshot() if job.rate_limiter else None
+        with job._lock:
+            job.status = status
+            job.finished_at = time.time()
+            job.request_rate = request_rate
+        print(f"Job {job.id} {status}")
+
+    def _prune(self):
+        """Forgets the oldest finished jobs beyond `history` (caller holds the lock)"""
+        finished = [j for j in self._jobs.values() if j.status in FINISHED_STATES]
+        for job in sorted(finished, key=lambda j: j.created_at)[:max(len(finished) - self.history, 0)]:
+            del self._jobs[job.id]
@@ -0,0 +1,165 @@
+import base64
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2.extras
+import psycopg2.pool
+
+import scraper
+
+LISTINGS_CACHE_TTL = float(os.getenv("LISTINGS_CACHE_TTL", "5"))  # Seconds a GET /listings response is reused
+LISTINGS_CACHE_SIZE = int(os.getenv("LISTINGS_CACHE_SIZE", "1024"))  # Distinct queries kept in the cache
+LISTINGS_DB_POOL_SIZE = int(os.getenv("LISTINGS_DB_POOL_SIZE", "8"))
+LISTINGS_MAX_LIMIT = 200
+
+# Sortable columns; each has a (column, id) index, so a page is one index range scan
+SORT_COLUMNS = ["scraped_at", "price", "area_m2"]
+
+LISTING_COLUMNS = ["id", "title", "location", "price", "area_m2", "bedrooms", "bathrooms", "parking", "floor",
+                   "url", "image_url", "scraped_at"]
+
+_pool = None
+_pool_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_pool():
+    """Connection pool for the read API: opening a connection per request would cost more than the query"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    1, LISTINGS_DB_POOL_SIZE, dbname=scraper.DB_NAME, user=scraper.DB_USER,
+                    password=scraper.DB_PASSWORD, host=scraper.DB_HOST, port=scraper.DB_PORT)
+    return _pool
+
+
+def encode_cursor(sort_value, listing_id):
+    if sort_value is not None:
+        sort_value = sort_value.isoformat() if hasattr(sort_value, "isoformat") else str(sort_value)
+    raw = json.dumps([sort_value, listing_id])  # A NULL sort value stays null, not the text "None"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """(sort value or None, id) of the last row of the previous page; raises ValueError for a bad cursor"""
+    try:
+        sort_value, listing_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return (str(sort_value) if sort_value is not None else None), int(listing_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def build_query(filters, sort="scraped_at", order="desc", limit=50, cursor=None, include_attributes=False):
+    """SQL and parameters of one page of listings (one extra row tells whether there is a next page)"""
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_COLUMNS)}")
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be asc or desc")
+
+    conditions = []
+    params = []
+    for column, operator, key in (("price", ">=", "min_price"), ("price", "<=", "max_price"),
+                                  ("area_m2", ">=", "min_area"), ("area_m2", "<=", "max_area"),
+                                  ("bedrooms", "=", "bedrooms"),
+                                  ("bedrooms", ">=", "min_bedrooms"), ("bedrooms", "<=", "max_bedrooms")):
+        if filters.get(key) is not None:
+            conditions.append(f"{column} {operator} %s")
+            params.append(filters[key])
+    if filters.get("location"):
+        conditions.append("location ILIKE %s")
+        params.append("%" + filters["location"].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    for amenity in filters.get("amenities") or []:
+        # Containment is answered by the GIN index on attributes; several amenities must all match
+        conditions.append("attributes @> %s::jsonb")
+        params.append(json.dumps({"amenities": [amenity]}))
+
+    # Rows without a sort value come last in either order. Each page reads the rows with a value
+    # and the ones without separately, each one index range scan, and merges the two
+    after = "<" if order == "desc" else ">"
+    with_value = [f"{sort} IS NOT NULL"]
+    without_value = [f"{sort} IS NULL"]
+    with_value_params = []
+    without_value_params = []
+    if cursor:
+        sort_value, listing_id = decode_cursor(cursor)
+        if sort_value is None:
+            # Already past every row with a value
+            with_value = None
+            without_value.append(f"id {after} %s")
+            without_value_params.append(listing_id)
+        else:
+            with_value.append(f"({sort}, id) {after} (%s, %s)")
+            with_value_params += [sort_value, listing_id]
+
+    columns = ", ".join(LISTING_COLUMNS + (["attributes"] if include_attributes else []))
+    branches = []
+    branch_params = []
+    for branch, extra_params, ordering in ((with_value, with_value_params, f"{sort} {order}, id {order}"),
+                                           (without_value, without_value_params, f"id {order}")):
+        if branch is None:
+            continue
+        branches.append(f"""(
+            SELECT {columns} FROM {scraper.TABLE_NAME}
+            WHERE {" AND ".join(conditions + branch)}
+            ORDER BY {ordering}
+            LIMIT %s
+        )""")
+        branch_params += params + extra_params + [limit + 1]
+    query = f"""
+        SELECT * FROM ({" UNION ALL ".join(branches)}) page
+        ORDER BY {sort} {order} NULLS LAST, id {order}
+        LIMIT %s
+    """
+    return query, branch_params + [limit + 1]
+
+
+def query_listings(filters, sort="scraped_at", order="desc", limit=50, cursor=None, include_attributes=False):
+    """
+    One page of listings matching `filters`, as {"items": [...], "next_cursor": ...}. Pages are
+    keyset-paginated on (sort, id), so deep pages cost the same as the first. Identical
+    queries within LISTINGS_CACHE_TTL seconds are answered from memory.
+    """
+    limit = max(1, min(limit, LISTINGS_MAX_LIMIT))
+    query, params = build_query(filters, sort, order, limit, cursor, include_attributes)
+
+    key = json.dumps([query, params], default=str)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and now - cached[0] < LISTINGS_CACHE_TTL:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][sort], rows[-1]["id"])
+    result = {"items": [{k: float(v) if k in ("price", "area_m2", "bathrooms") and v is not None else v
+                         for k, v in row.items()} for row in rows],
+              "next_cursor": next_cursor}
+
+    with _cache_lock:
+        _cache[key] = (now, result)
+        _cache.move_to_end(key)
+        while len(_cache) > LISTINGS_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -0,0 +1,44 @@
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Prometheus metrics of the crawl, served by GET /metrics. Durations are in seconds.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "scraper_http_request_duration_seconds", "Latency of each HTTP request attempt, retries included",
+    buckets=DURATION_BUCKETS)
+HTTP_RESPONSES = Counter(
+    "scraper_http_responses_total", "HTTP responses by status code ('error' when no response arrived)",
+    ["status"])
+PAGES_FETCHED = Counter(
+    "scraper_pages_fetched_total",
+    "Pages requested by the scraper, by where the body came from: network, cache (fresh), "
+    "revalidated (304) or failed",
+    ["source"])
+CACHE_REQUESTS = Counter(
+    "scraper_cache_requests_total", "Response cache lookups by result (hit or miss)", ["result"])
+REQUEST_RATE = Gauge(
+    "scraper_request_rate", "Requests per second the adaptive rate limiter currently allows, by host", ["host"])
+RATE_DECREASES = Counter(
+    "scraper_rate_decreases_total", "Times the request rate was cut, by reason (throttled, error or latency)",
+    ["reason"])
+
+PARSE_SECONDS = Histogram(
+    "scraper_parse_duration_seconds", "Time to extract one page, by page type (listing or detail)",
+    ["page"], buckets=DURATION_BUCKETS)
+LISTINGS_SCRAPED = Counter("scraper_listings_scraped_total", "Listings whose detail page was scraped")
+
+CLEAN_SECONDS = Histogram(
+    "scraper_clean_duration_seconds", "Duration of clean_data per batch", buckets=DURATION_BUCKETS)
+DB_LOAD_SECONDS = Histogram(
+    "scraper_db_load_duration_seconds", "Duration of load_data_to_db per batch", buckets=DURATION_BUCKETS)
+DB_ROWS = Counter(
+    "scraper_db_rows_total", "Rows sent to the database by outcome: written (new or changed) or skipped "
+    "(unchanged)", ["result"])
+
+JOBS = Gauge("scraper_jobs", "Scrape jobs known to this process, by status", ["status"])
+
+
+def render():
+    """Returns (body, content type) of the metrics exposition"""
+    return generate_latest(), CONTENT_TYPE_LATEST
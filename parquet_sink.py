@@ -0,0 +1,120 @@
+import os
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+PARQUET_DIR = os.getenv("PARQUET_DIR", "output/listings")
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+
+PARTITION_COLUMN = "scrape_date"
+
+# Typed columns instead of the JSON 'attributes' string: numbers stay numbers, and the list-like
+# fields are nested lists (models: one string map per model, since each has its own keys)
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("url", pa.string()),
+    ("title", pa.string()),
+    ("location", pa.string()),
+    ("price", pa.float64()),
+    ("area_m2", pa.float64()),
+    ("bedrooms", pa.int32()),
+    ("bathrooms", pa.float64()),
+    ("parking", pa.int32()),
+    ("floor", pa.int32()),
+    ("description", pa.string()),
+    ("page_title", pa.string()),
+    ("subtitle", pa.string()),
+    ("listing_price", pa.string()),
+    ("amenities", pa.list_(pa.string())),
+    ("apartment_features", pa.list_(pa.string())),
+    ("additional_benefits", pa.list_(pa.string())),
+    ("property_specs_raw", pa.list_(pa.string())),
+    ("models", pa.list_(pa.map_(pa.string(), pa.string()))),
+    ("models_flat", pa.list_(pa.string())),
+    ("card_fingerprint", pa.string()),
+    ("image_url", pa.string()),
+    ("marketplace_id", pa.int64()),
+    ("scraped_at", pa.timestamp("us")),
+])
+
+SCALAR_COLUMNS = ["id", "url", "title", "location", "price", "area_m2", "bedrooms", "bathrooms", "parking",
+                  "floor", "description", "image_url", "marketplace_id"]
+TEXT_COLUMNS = ["page_title", "subtitle", "listing_price", "card_fingerprint"]
+STRING_LIST_COLUMNS = ["amenities", "apartment_features", "additional_benefits", "property_specs_raw", "models_flat"]
+
+
+def _string_list(value):
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value if item is not None]
+    return None
+
+
+def _model_maps(value):
+    """Each model as a list of (key, value) string pairs, the shape Arrow builds a map from"""
+    if not isinstance(value, (list, tuple)):
+        return None
+    return [[(str(k), str(v)) for k, v in model.items() if v is not None] if isinstance(model, dict)
+            else [("model_title", str(model))] for model in value]
+
+
+def _text(value):
+    return None if value is None or value is pd.NA or (isinstance(value, float) and value != value) else str(value)
+
+
+def batch_table(df_cleaned, df_raw):
+    """
+    Arrow table of one flushed batch: the cleaned, typed columns of `df_cleaned` plus the
+    nested fields of the matching `df_raw` rows (clean_data keeps the index of its input).
+    """
+    raw = df_raw.loc[df_cleaned.index]
+    columns = {col: df_cleaned[col].tolist() for col in SCALAR_COLUMNS}
+    columns["scraped_at"] = pd.to_datetime(df_cleaned["scraped_at"], format="ISO8601").tolist()
+    for col in TEXT_COLUMNS:
+        columns[col] = [_text(value) for value in raw[col]] if col in raw.columns else [None] * len(raw)
+    for col in STRING_LIST_COLUMNS:
+        columns[col] = [_string_list(value) for value in raw[col]] if col in raw.columns else [None] * len(raw)
+    columns["models"] = [_model_maps(value) for value in raw["models"]] if "models" in raw.columns else [None] * len(raw)
+    return pa.table({field.name: pa.array(columns[field.name], type=field.type) for field in SCHEMA}, schema=SCHEMA)
+
+
+def write_batch(df_cleaned, df_raw, directory=PARQUET_DIR):
+    """
+    Appends one batch to the dataset: one new Parquet file per scrape date, under
+    <directory>/scrape_date=YYYY-MM-DD/. Files are written under a temporary name and renamed
+    into place, so readers never see a half-written file. Returns the files written.
+    """
+    if not len(df_cleaned):
+        return []
+    table = batch_table(df_cleaned, df_raw)
+    dates = pd.to_datetime(df_cleaned["scraped_at"], format="ISO8601").dt.strftime("%Y-%m-%d").tolist()
+
+    written = []
+    for date in sorted(set(dates)):
+        part = table.filter(pa.array([d == date for d in dates])) if len(set(dates)) > 1 else table
+        partition_dir = os.path.join(directory, f"{PARTITION_COLUMN}={date}")
+        os.makedirs(partition_dir, exist_ok=True)
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        tmp_path = os.path.join(partition_dir, f".{name}.tmp")
+        pq.write_table(part, tmp_path, compression=PARQUET_COMPRESSION)
+        os.replace(tmp_path, os.path.join(partition_dir, name))
+        written.append(os.path.join(partition_dir, name))
+    return written
+
+
+def read_listings(columns=None, since=None, until=None, directory=PARQUET_DIR):
+    """
+    Reads the dataset into a DataFrame, loading only `columns` (all by default) and only the
+    scrape-date partitions between `since` and `until` (YYYY-MM-DD, inclusive).
+    """
+    partitioning = ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+    dataset = ds.dataset(directory, format="parquet", partitioning=partitioning)
+    date = ds.field(PARTITION_COLUMN)
+    condition = None
+    if since:
+        condition = date >= since
+    if until:
+        condition = (date <= until) if condition is None else condition & (date <= until)
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
@@ -0,0 +1,183 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+
+SCRAPER_PROFILE = os.getenv("SCRAPER_PROFILE", "0") == "1"  # Profile every job, not only the ones that ask
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))  # Seconds between stack samples
+
+
+def fold(frame):
+    """Collapsed-stack form of a frame's call stack: outermost first, frames joined by ';'"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """
+    Samples the Python stack of every thread currently inside a stage, every `interval`
+    seconds, and counts the collapsed stacks per stage. Unlike cProfile, the samples keep
+    whole call paths and include the time spent waiting (on the network, the database, ...).
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = {}
+        self._active = {}  # thread id -> stage
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def enter(self, stage):
+        """Marks the calling thread as working on `stage`; returns the stage it was on before"""
+        ident = threading.get_ident()
+        with self._lock:
+            previous = self._active.get(ident)
+            self._active[ident] = stage
+        return previous
+
+    def leave(self, previous):
+        ident = threading.get_ident()
+        with self._lock:
+            if previous is None:
+                self._active.pop(ident, None)
+            else:
+                self._active[ident] = previous
+
+    def merge(self, stage, stacks):
+        """Adds stack counts sampled elsewhere (e.g. in a worker process) to `stage`"""
+        with self._lock:
+            self.stacks.setdefault(stage, Counter()).update(stacks)
+
+    def _run(self):
+        sampler = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, stage in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != sampler:
+                        self.stacks.setdefault(stage, Counter())[fold(frame)] += 1
+
+
+class _StatsHolder:
+    """Raw cProfile stats shaped like a Profile, so pstats.Stats can load them after pickling"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def run_profiled(fn, *args):
+    """
+    Runs fn(*args) profiled in a worker process (e.g. a detail page parse on the parse pool) and
+    returns (result, (cProfile stats, collapsed stacks)) for the parent's JobProfiler.add.
+    """
+    sampler = StackSampler()
+    sampler.start()
+    profile = cProfile.Profile()
+    previous = sampler.enter("worker")
+    profile.enable()
+    try:
+        result = fn(*args)
+    finally:
+        profile.disable()
+        sampler.leave(previous)
+        sampler.stop()
+    profile.create_stats()
+    return result, (profile.stats, sampler.stacks.get("worker", Counter()))
+
+
+class JobProfiler:
+    """
+    Per-job profile of the crawl stages (fetch, parse, clean, load).
+
+    Stage functions wrapped with `wrap` run under cProfile, and a background sampler records
+    their collapsed stacks. `write` saves, per stage, a .prof file (pstats, snakeviz), a
+    .collapsed file (flamegraph.pl, speedscope) and a summary of the hottest functions under
+    PROFILE_DIR/<job_id>/. Jobs without a profiler never touch any of this.
+    """
+
+    def __init__(self, job_id, directory=PROFILE_DIR):
+        self.job_id = job_id
+        self.directory = os.path.join(directory, job_id)
+        self.sampler = StackSampler()
+        self.sampler.start()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, stage, fn):
+        """Returns fn instrumented as part of `stage`"""
+        def profiled(*args, **kwargs):
+            profile = cProfile.Profile()
+            previous = self.sampler.enter(stage)
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one active cProfile at a time: this call is only sampled
+                profile = None
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if profile is not None:
+                    profile.disable()
+                self.sampler.leave(previous)
+                if profile is not None:
+                    profile.create_stats()
+                    self._add_stats(stage, profile.stats)
+        return profiled
+
+    def add(self, stage, profiled):
+        """Merges the profile returned by run_profiled into `stage`"""
+        stats, stacks = profiled
+        self._add_stats(stage, stats)
+        self.sampler.merge(stage, stacks)
+
+    def _add_stats(self, stage, stats):
+        with self._lock:
+            if stage in self._stats:
+                self._stats[stage].add(_StatsHolder(stats))
+            else:
+                self._stats[stage] = pstats.Stats(_StatsHolder(stats))
+
+    def write(self):
+        """Stops sampling and writes the per-stage profiles; returns the directory"""
+        self.sampler.stop()
+        os.makedirs(self.directory, exist_ok=True)
+
+        summary = io.StringIO()
+        with self._lock:
+            for stage, stats in sorted(self._stats.items()):
+                stats.dump_stats(os.path.join(self.directory, f"{stage}.prof"))
+                summary.write(f"===== {stage} =====\n")
+                stats.stream = summary
+                stats.sort_stats("cumulative").print_stats(25)
+
+        for stage, stacks in sorted(self.sampler.stacks.items()):
+            with open(os.path.join(self.directory, f"{stage}.collapsed"), "w") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+
+        with open(os.path.join(self.directory, "summary.txt"), "w") as f:
+            f.write(summary.getvalue())
+        print(f"📊 Profiles for job {self.job_id} written to {self.directory}")
+        return self.directory
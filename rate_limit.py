@@ -0,0 +1,153 @@
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import metrics
+
+RATE_LIMIT_INITIAL = float(os.getenv("RATE_LIMIT_INITIAL", "2"))  # Requests/sec per host a process starts at
+RATE_LIMIT_MIN = float(os.getenv("RATE_LIMIT_MIN", "0.2"))
+RATE_LIMIT_MAX = float(os.getenv("RATE_LIMIT_MAX", "20"))
+RATE_LIMIT_INCREASE = float(os.getenv("RATE_LIMIT_INCREASE", "0.5"))  # Requests/sec gained per second of healthy responses
+RATE_LIMIT_DECREASE = float(os.getenv("RATE_LIMIT_DECREASE", "0.5"))  # Factor the rate is cut by when the site pushes back
+# Latency (smoothed) this many times the best seen counts as the site slowing down under load
+RATE_LIMIT_LATENCY_FACTOR = float(os.getenv("RATE_LIMIT_LATENCY_FACTOR", "2"))
+RATE_LIMIT_RETRY_AFTER_MAX = float(os.getenv("RATE_LIMIT_RETRY_AFTER_MAX", "300"))  # Longest Retry-After honored, seconds
+
+THROTTLE_STATUS_CODES = {429, 503}
+LATENCY_SMOOTHING = 0.2  # Weight of the newest sample in the latency average
+BASELINE_DRIFT = 0.01  # How fast the best-latency baseline follows a lasting slowdown
+
+
+def parse_retry_after(value):
+    """
+    Seconds to wait from a Retry-After header (delta-seconds or HTTP date), capped; None if
+    absent or invalid. "0" is a valid header: 0.0, retry right away.
+    """
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+        if not math.isfinite(seconds):
+            return None
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), RATE_LIMIT_RETRY_AFTER_MAX)
+
+
+class AdaptiveRateLimiter:
+    """
+    AIMD request pacing for one host, shared by every thread fetching from it.
+
+    `acquire` spaces requests 1/rate seconds apart. Every healthy response (fast and not an
+    error) adds RATE_LIMIT_INCREASE/rate to the rate, about RATE_LIMIT_INCREASE requests/sec
+    per second, but only while the limit is what holds requests back. A 429/503, a failed
+    request or a latency average above RATE_LIMIT_LATENCY_FACTOR times the best seen cuts the
+    rate by RATE_LIMIT_DECREASE. Only requests sent after the last cut can cut it again or count
+    towards the latency average, so the ones already in flight when the site pushed back don't
+    each cut it again. A Retry-After pauses the host entirely.
+    """
+
+    def __init__(self, host, rate=RATE_LIMIT_INITIAL, min_rate=RATE_LIMIT_MIN, max_rate=RATE_LIMIT_MAX):
+        self.host = host
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.latency = None
+        self.baseline_latency = None
+        self.decreases = {"throttled": 0, "error": 0, "latency": 0}
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._held_back = False  # A request had to wait for its slot since the last increase
+        metrics.REQUEST_RATE.labels(host).set(self.rate)
+
+    def acquire(self):
+        """Blocks until the calling thread may send its request"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self._blocked_until > now:
+                    slot = None
+                    wait = self._blocked_until - now
+                else:
+                    slot = max(now, self._next_slot)
+                    self._next_slot = slot + 1 / self.rate
+                    wait = slot - now
+                    if wait > 0:
+                        self._held_back = True
+            if wait > 0:
+                time.sleep(wait)
+            # A Retry-After that arrived while this thread waited for its slot still applies
+            if slot is not None and self._blocked_until <= slot:
+                return
+
+    def record(self, latency, status=None, retry_after=None):
+        """Feeds back one request: its latency, status code (None if no response came) and Retry-After header"""
+        with self._lock:
+            now = time.monotonic()
+            sent = now - latency
+            if status in THROTTLE_STATUS_CODES:
+                pause = parse_retry_after(retry_after)
+                if pause is not None:
+                    self._blocked_until = max(self._blocked_until, now + pause)
+                    self._next_slot = max(self._next_slot, self._blocked_until)
+                self._decrease(sent, "throttled")
+            elif status is None or status >= 500:
+                self._decrease(sent, "error")
+            elif sent >= self._last_decrease:
+                self.latency = latency if self.latency is None else \
+                    self.latency + LATENCY_SMOOTHING * (latency - self.latency)
+                if self.baseline_latency is None or self.latency < self.baseline_latency:
+                    self.baseline_latency = self.latency
+                else:
+                    self.baseline_latency += BASELINE_DRIFT * (self.latency - self.baseline_latency)
+                if self.latency > self.baseline_latency * RATE_LIMIT_LATENCY_FACTOR:
+                    self._decrease(sent, "latency")
+                elif self._held_back:
+                    self.rate = min(self.max_rate, self.rate + RATE_LIMIT_INCREASE / self.rate)
+                    self._held_back = False
+            metrics.REQUEST_RATE.labels(self.host).set(self.rate)
+
+    def _decrease(self, sent, reason):
+        """Multiplicative decrease in answer to a request sent at `sent` (caller holds the lock)"""
+        if sent < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self.rate = max(self.min_rate, self.rate * RATE_LIMIT_DECREASE)
+        # The latency average starts over from the baseline for the requests sent at the new rate
+        self.latency = self.baseline_latency
+        self.decreases[reason] += 1
+        metrics.RATE_DECREASES.labels(reason).inc()
+        print(f"Request rate for {self.host} lowered to {self.rate:.2f}/s ({reason})")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "host": self.host,
+                "requests_per_sec": round(self.rate, 2),
+                "latency_ms": round(self.latency * 1000) if self.latency is not None else None,
+                "baseline_latency_ms": round(self.baseline_latency * 1000) if self.baseline_latency is not None else None,
+                "paused_for_seconds": round(max(self._blocked_until - time.monotonic(), 0.0), 1),
+                "decreases": dict(self.decreases),
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(url):
+    """The process-wide limiter of the host `url` points at"""
+    host = urlparse(url).netloc
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = AdaptiveRateLimiter(host)
+        return _limiters[host]
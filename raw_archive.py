@@ -0,0 +1,132 @@
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+
+import zstandard
+
+RAW_ARCHIVE_ENABLED = os.getenv("RAW_ARCHIVE_ENABLED", "1") == "1"
+RAW_ARCHIVE_DIR = os.getenv("RAW_ARCHIVE_DIR", "archive/raw")
+RAW_ARCHIVE_LEVEL = int(os.getenv("RAW_ARCHIVE_LEVEL", "3"))  # zstd compression level
+RAW_ARCHIVE_SEGMENT_MB = float(os.getenv("RAW_ARCHIVE_SEGMENT_MB", "256"))  # A new segment file starts past this size
+
+LISTING = "listing"
+DETAIL = "detail"
+
+
+def page_kind(url):
+    """Listing pages are the paginated search results (?page=N); everything else is a detail page"""
+    return LISTING if "page" in parse_qs(urlparse(url).query) else DETAIL
+
+
+def read_blob(directory, segment, offset, length):
+    """Reads and decompresses one stored page (safe to call from any process)"""
+    with open(os.path.join(directory, segment), "rb") as f:
+        f.seek(offset)
+        return zstandard.ZstdDecompressor().decompress(f.read(length))
+
+
+class RawArchive:
+    """
+    Content-addressed archive of every page body fetched from the site.
+
+    Bodies are stored once per SHA-256 digest as independent zstd frames appended to segment
+    files, so any page can be read back with a single seek. A SQLite index maps the digest to
+    its (segment, offset, length) and records every (url, fetched_at) the body was seen at.
+    Each process appends to its own segment files, so replicas can share the directory.
+    """
+
+    def __init__(self, directory=RAW_ARCHIVE_DIR, level=RAW_ARCHIVE_LEVEL,
+                 segment_bytes=int(RAW_ARCHIVE_SEGMENT_MB * 1024 * 1024)):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_file = None
+        self._segment_count = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False,
+                                     isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fetches (
+                url TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                digest TEXT NOT NULL REFERENCES blobs (digest),
+                PRIMARY KEY (url, fetched_at)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS fetches_kind_url ON fetches (kind, url, fetched_at)")
+
+    def put(self, url, content):
+        """Records that `url` returned `content` now, storing the body unless it is already archived"""
+        digest = hashlib.sha256(content).hexdigest()
+        fetched_at = datetime.now().isoformat(timespec="microseconds")
+        with self._lock:
+            known = self._conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if known is None:
+                frame = self._compressor.compress(content)
+                segment, offset = self._append(frame)
+                self._conn.execute("INSERT OR IGNORE INTO blobs (digest, segment, offset, length, size) "
+                                   "VALUES (?, ?, ?, ?, ?)", (digest, segment, offset, len(frame), len(content)))
+            self._conn.execute("INSERT OR REPLACE INTO fetches (url, fetched_at, kind, digest) VALUES (?, ?, ?, ?)",
+                               (url, fetched_at, page_kind(url), digest))
+        return digest
+
+    def _append(self, frame):
+        """Appends a frame to this process's current segment (caller holds the lock)"""
+        if self._segment_file is None or self._segment_file.tell() + len(frame) > self.segment_bytes:
+            if self._segment_file is not None:
+                self._segment_file.close()
+            self._segment_count += 1
+            self._segment = f"segment-{socket.gethostname()}-{os.getpid()}-{int(time.time())}-{self._segment_count}.zst"
+            self._segment_file = open(os.path.join(self.directory, self._segment), "ab")
+        offset = self._segment_file.tell()
+        self._segment_file.write(frame)
+        self._segment_file.flush()
+        return self._segment, offset
+
+    def get(self, url, at=None):
+        """Body of the latest archived fetch of `url` (at or before `at`, an ISO time), or None"""
+        query = ("SELECT b.segment, b.offset, b.length FROM fetches f JOIN blobs b ON b.digest = f.digest "
+                 "WHERE f.url = ?" + (" AND f.fetched_at <= ?" if at else "") + " ORDER BY f.fetched_at DESC LIMIT 1")
+        with self._lock:
+            row = self._conn.execute(query, (url, at) if at else (url,)).fetchone()
+        return read_blob(self.directory, *row) if row else None
+
+    def latest(self, kind, since=None):
+        """
+        The latest archived fetch of every URL of `kind`, fetched at or after `since` (an ISO
+        time) when given, as (url, fetched_at, segment, offset, length) in storage order.
+        """
+        with self._lock:
+            return self._conn.execute(f"""
+                SELECT f.url, max(f.fetched_at), b.segment, b.offset, b.length
+                FROM fetches f JOIN blobs b ON b.digest = f.digest
+                WHERE f.kind = ? {"AND f.fetched_at >= ?" if since else ""}
+                GROUP BY f.url
+                ORDER BY b.segment, b.offset
+            """, (kind, since) if since else (kind,)).fetchall()
+
+    def stats(self):
+        with self._lock:
+            blobs, stored, raw = self._conn.execute(
+                "SELECT count(*), COALESCE(SUM(length), 0), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            fetches, urls = self._conn.execute("SELECT count(*), count(DISTINCT url) FROM fetches").fetchone()
+        return {"pages": blobs, "fetches": fetches, "urls": urls, "stored_bytes": stored, "raw_bytes": raw}
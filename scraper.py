@@ -1,16 +1,44 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from bs4 import BeautifulSoup, NavigableString
 import pandas as pd
 import time
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 import re
 import numpy as np
 import ast
-import uuid
 from datetime import datetime
 import json
+from json.encoder import encode_basestring_ascii
 import psycopg2
+import psycopg2.extras
+import io
+import csv
 import os
+import hashlib
+import bisect
+import http_cache
+import metrics
+import profiling
+import raw_archive
+import rate_limit
+import selector_stats
+import threading
+import contextlib
+import contextvars
+import random
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from collections import deque
+from itertools import islice, repeat
+
+try:
+    # Optional lexbor-backed parser for the listing page fast path
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
 
 BASE_URL = "https://www.encuentra24.com"
 
@@ -19,58 +47,404 @@ headers = {
 }
 
 
-def get_soup(url):
+# --- HTTP SESSION ---
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))  # Keep-alive connections kept per host
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "1"))  # Seconds, doubled on every retry
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Returns the shared connection-pooled session used for every request"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, pool_block=True)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(headers)
+                # gzip/deflate always, plus br when the brotli package is installed
+                session.headers.update(make_headers(accept_encoding=True))
+                _session = session
+    return _session
+
+
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+
+def host_slots(url):
+    """
+    The semaphore every request to the host of `url` holds while in flight, shared by all
+    fetches (listing and detail pages alike), so together they never exceed
+    SCRAPER_MAX_CONCURRENCY_PER_HOST whatever the pool sizes
+    """
+    host = urlparse(url).netloc
+    with _host_slots_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(max(1, SCRAPER_MAX_CONCURRENCY_PER_HOST))
+        return _host_slots[host]
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given retry attempt (0-based)"""
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+
+def fetch_page(url, extra_headers=None):
+    """
+    GET a URL on the shared session, retrying timeouts, connection errors, 429s and 5xx responses.
+    Every attempt holds one of the host's in-flight slots (host_slots), is paced by its adaptive
+    rate limiter (rate_limit.py) and has its outcome fed back to it; a 429/503 with Retry-After
+    waits that long instead of the usual backoff.
+    Returns the last response received, or None if every attempt failed at the network level.
+    """
+    session = get_session()
+    limiter = rate_limit.limiter_for(url)
+    slots = host_slots(url)
+    response = None
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        # The slot is held for the request only, not the backoff before a retry
+        with slots:
+            limiter.acquire()
+            start = time.perf_counter()
+            retry_after = None
+            try:
+                response = session.get(url, headers=extra_headers, timeout=HTTP_TIMEOUT)
+                elapsed = time.perf_counter() - start
+                metrics.HTTP_REQUEST_SECONDS.observe(elapsed)
+                metrics.HTTP_RESPONSES.labels(response.status_code).inc()
+                retry_after = response.headers.get("Retry-After")
+                limiter.record(elapsed, response.status_code, retry_after)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                reason = f"Status {response.status_code}"
+            except (requests.Timeout, requests.ConnectionError) as e:
+                elapsed = time.perf_counter() - start
+                metrics.HTTP_REQUEST_SECONDS.observe(elapsed)
+                metrics.HTTP_RESPONSES.labels("error").inc()
+                limiter.record(elapsed)
+                reason = str(e)
+
+        if attempt < HTTP_MAX_RETRIES:
+            if response is not None and response.status_code in rate_limit.THROTTLE_STATUS_CODES \
+                    and rate_limit.parse_retry_after(retry_after) is not None:
+                # The limiter holds every request to the host until Retry-After has passed (a
+                # Retry-After of 0 retries right away, still within the host's in-flight slots)
+                print(f"Retrying {url} after Retry-After: {retry_after} ({reason})")
+                continue
+            delay = backoff_delay(attempt)
+            print(f"Retrying {url} in {delay:.1f}s ({reason})")
+            time.sleep(delay)
+    return response
+
+
+# Opened on first use, so processes that never fetch (the parse workers, which import this
+# module too) don't open the cache database or the archive files
+_response_cache = None
+_raw_archive = None
+_stores_lock = threading.Lock()
+
+
+def get_response_cache():
+    """The process-wide response cache (http_cache.py), or None when HTTP_CACHE_ENABLED is off"""
+    global _response_cache
+    if _response_cache is None and http_cache.HTTP_CACHE_ENABLED:
+        with _stores_lock:
+            if _response_cache is None:
+                _response_cache = http_cache.ResponseCache()
+    return _response_cache
+
+
+def get_raw_archive():
+    """The process-wide raw page archive (raw_archive.py), or None when RAW_ARCHIVE_ENABLED is off"""
+    global _raw_archive
+    if _raw_archive is None and raw_archive.RAW_ARCHIVE_ENABLED:
+        with _stores_lock:
+            if _raw_archive is None:
+                _raw_archive = raw_archive.RawArchive()
+    return _raw_archive
+
+
+def archive_page(url, content):
+    """Keeps the body in the raw page archive; a failing archive never fails the fetch"""
+    archive = get_raw_archive()
+    if archive:
+        try:
+            archive.put(url, content)
+        except Exception as e:
+            print(f"Could not archive {url}: {e}")
+
+
+# Response cache hits/misses of the job fetching in this context (count_cache_stats), if any
+_job_cache_stats = contextvars.ContextVar("job_cache_stats", default=None)
+_job_cache_stats_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def count_cache_stats():
+    """
+    Counts the response cache hits/misses of the fetches made inside the block, including the
+    ones handed to fetch threads, and yields them as {"hits", "misses"}. Jobs running at the
+    same time each count their own.
+    """
+    stats = {"hits": 0, "misses": 0}
+    token = _job_cache_stats.set(stats)
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            return BeautifulSoup(response.content, "html.parser")
+        yield stats
+    finally:
+        _job_cache_stats.reset(token)
+
+
+def record_cache(cache, hit):
+    cache.record(hit=hit)
+    stats = _job_cache_stats.get()
+    if stats is not None:
+        with _job_cache_stats_lock:
+            stats["hits" if hit else "misses"] += 1
+
+
+def fetch_content(url):
+    """
+    Returns (content, unchanged) for a URL, going through the response cache when it is enabled.
+    `unchanged` is True when the body came from the cache, either still fresh or confirmed
+    by a 304 Not Modified. content is None when the page could not be fetched.
+    """
+    cache = get_response_cache()
+    try:
+        entry = cache.get(url) if cache else None
+        if entry and entry["fresh"]:
+            record_cache(cache, hit=True)
+            metrics.CACHE_REQUESTS.labels("hit").inc()
+            metrics.PAGES_FETCHED.labels("cache").inc()
+            return entry["content"], True
+
+        response = fetch_page(url, cache.conditional_headers(entry) if entry else None)
+        if response is None:
+            print(f"Failed to fetch {url}: retries exhausted")
+        elif response.status_code == 304 and entry:
+            cache.revalidated(url)
+            record_cache(cache, hit=True)
+            metrics.CACHE_REQUESTS.labels("hit").inc()
+            metrics.PAGES_FETCHED.labels("revalidated").inc()
+            archive_page(url, entry["content"])
+            return entry["content"], True
+        elif response.status_code == 200:
+            if cache:
+                cache.put(url, response.content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+                record_cache(cache, hit=False)
+                metrics.CACHE_REQUESTS.labels("miss").inc()
+            metrics.PAGES_FETCHED.labels("network").inc()
+            archive_page(url, response.content)
+            return response.content, False
         else:
             print(f"Failed to fetch {url}: Status {response.status_code}")
     except Exception as e:
         print(f"Error fetching {url}: {e}")
-    return None
+    metrics.PAGES_FETCHED.labels("failed").inc()
+    return None, False
 
 
-def scrape_main_listings(page_url, max_pages=1):
+# --- HTML PARSING ---
+# BeautifulSoup tree builder used everywhere: "html.parser", "lxml" or "html5lib"
+HTML_PARSER = os.getenv("HTML_PARSER", "html.parser")
+# Listing pages can skip BeautifulSoup entirely: "bs4" or "selectolax" (needs the selectolax package)
+LISTING_PARSER = os.getenv("LISTING_PARSER", "bs4")
+
+
+def _extraction_version():
+    """
+    Fingerprint of the extraction code (this module's source) and the tree builder. Parsed
+    results cached by another version are re-extracted, so a parser change never serves stale
+    fields; any edit to this module counts as a change, the cached bodies are kept either way.
+    """
+    with open(__file__, "rb") as f:
+        source = f.read()
+    return hashlib.blake2b(source + HTML_PARSER.encode("utf-8"), digest_size=8).hexdigest()
+
+
+EXTRACTION_VERSION = _extraction_version()
+
+
+def parse_html(content, parser=None):
+    return BeautifulSoup(content, parser or HTML_PARSER)
+
+
+def get_soup(url):
+    content, _ = fetch_content(url)
+    if content is None:
+        return None
+    return parse_html(content)
+
+
+def card_fingerprint(title, price):
+    """Short hash of the card-level title and price, used to detect listings that changed"""
+    return hashlib.md5(f"{title or ''}|{price or ''}".encode("utf-8")).hexdigest()
+
+
+def make_listing(title, price, location, href):
+    return {
+        "title": title,
+        "price": price,
+        "location": location,
+        "link": urljoin(BASE_URL, href),
+        "card_fingerprint": card_fingerprint(title, price)
+    }
+
+
+# Fallback selectors of each listing card field, in priority order (selector_stats.py counts their hits)
+CARD_SELECTORS = selector_stats.chain("card", ["div.d3-ad-tile", ".listing-card", ".property-card"])
+CARD_TITLE_SELECTORS = selector_stats.chain("card_title", [".d3-ad-tile__title", ".title", "h2", "h3"])
+CARD_PRICE_SELECTORS = selector_stats.chain("card_price", [".d3-ad-tile__price", ".price", ".price-tag"])
+CARD_LOCATION_SELECTORS = selector_stats.chain("card_location",
+                                               [".d3-ad-tile__location span", ".location", ".address"])
+CARD_LINK_SELECTORS = selector_stats.chain("card_link", ["a.d3-ad-tile__description", "a", "a[href]"])
+
+
+def extract_listing_cards(soup):
+    """Extracts the listing cards from a parsed listing page"""
     listings = []
-    for page in range(1, max_pages + 1):
-        print(f"Scraping listing page {page}")
-        soup = get_soup(f"{page_url}?page={page}")
-        if not soup:
-            continue
 
-        # Multiple possible selectors for listing cards
-        cards = soup.select("div.d3-ad-tile") or soup.select(".listing-card") or soup.select(".property-card")
-
-        for card in cards:
-            # Try multiple selectors for each field
-            title_elem = (card.select_one(".d3-ad-tile__title") or
-                          card.select_one(".title") or
-                          card.select_one("h2") or
-                          card.select_one("h3"))
-
-            price_elem = (card.select_one(".d3-ad-tile__price") or
-                          card.select_one(".price") or
-                          card.select_one(".price-tag"))
-
-            location_elem = (card.select_one(".d3-ad-tile__location span") or
-                             card.select_one(".location") or
-                             card.select_one(".address"))
-
-            link_elem = (card.select_one("a.d3-ad-tile__description") or
-                         card.select_one("a") or
-                         card.find("a", href=True))
-
-            if link_elem and link_elem.get('href'):
-                full_link = urljoin(BASE_URL, link_elem['href'])
-                listings.append({
-                    "title": title_elem.get_text(strip=True) if title_elem else None,
-                    "price": price_elem.get_text(strip=True) if price_elem else None,
-                    "location": location_elem.get_text(strip=True) if location_elem else None,
-                    "link": full_link
-                })
-
-        time.sleep(2)  # Be respectful with delays
+    # Multiple possible selectors for listing cards
+    cards = CARD_SELECTORS.select(soup)
+
+    for card in cards:
+        # Try multiple selectors for each field
+        title_elem = CARD_TITLE_SELECTORS.first(card)
+        price_elem = CARD_PRICE_SELECTORS.first(card)
+        location_elem = CARD_LOCATION_SELECTORS.first(card)
+        link_elem = CARD_LINK_SELECTORS.first(card)
+
+        if link_elem and link_elem.get('href'):
+            listings.append(make_listing(
+                title_elem.get_text(strip=True) if title_elem else None,
+                price_elem.get_text(strip=True) if price_elem else None,
+                location_elem.get_text(strip=True) if location_elem else None,
+                link_elem['href']
+            ))
+
+    return listings
+
+
+def extract_listing_cards_lexbor(content):
+    """Same extraction as extract_listing_cards, on selectolax's lexbor parser"""
+    tree = LexborHTMLParser(content)
+    cards = tree.css("div.d3-ad-tile") or tree.css(".listing-card") or tree.css(".property-card")
+
+    listings = []
+    for card in cards:
+        title_elem = CARD_TITLE_SELECTORS.first_css(card)
+        price_elem = CARD_PRICE_SELECTORS.first_css(card)
+        location_elem = CARD_LOCATION_SELECTORS.first_css(card)
+        link_elem = CARD_LINK_SELECTORS.first_css(card)
+
+        href = link_elem.attributes.get('href') if link_elem is not None else None
+        if href:
+            listings.append(make_listing(
+                title_elem.text(strip=True) if title_elem is not None else None,
+                price_elem.text(strip=True) if price_elem is not None else None,
+                location_elem.text(strip=True) if location_elem is not None else None,
+                href
+            ))
+
+    return listings
+
+
+def parse_listing_page(content, backend=None):
+    """
+    Extracts the listing cards from a listing page's raw HTML.
+    backend: "selectolax", "bs4" (BeautifulSoup with HTML_PARSER) or a BeautifulSoup tree builder
+    name such as "lxml"; defaults to LISTING_PARSER.
+    """
+    backend = backend or LISTING_PARSER
+    with metrics.PARSE_SECONDS.labels("listing").time():
+        if backend == "selectolax":
+            if LexborHTMLParser is None:
+                raise ImportError("LISTING_PARSER=selectolax requires the selectolax package")
+            return extract_listing_cards_lexbor(content)
+        return extract_listing_cards(parse_html(content, None if backend == "bs4" else backend))
+
+
+# --- LISTING PAGE DISCOVERY ---
+LISTING_CONCURRENCY = int(os.getenv("LISTING_CONCURRENCY", "4"))  # Listing pages fetched at once (capped per host)
+# Extra pause each fetcher keeps between pages, on top of the adaptive rate limit (0: the limiter alone paces)
+LISTING_REQUEST_DELAY = float(os.getenv("LISTING_REQUEST_DELAY", "0"))
+
+
+def _polite_fetch_listing_page(page_url, page, delay):
+    """Wait `delay` seconds, then fetch and parse one listing page (None if it could not be fetched)"""
+    if delay:
+        time.sleep(delay)
+    print(f"Scraping listing page {page}")
+    content, _ = fetch_content(f"{page_url}?page={page}")
+    return parse_listing_page(content) if content is not None else None
+
+
+def iter_numbered_listing_pages(page_url, max_pages=1, start_page=1, concurrency=LISTING_CONCURRENCY,
+                                delay=LISTING_REQUEST_DELAY):
+    """
+    Yields (page, listings) for each listing page from `start_page` on, in page order.
+
+    Up to `concurrency` pages are fetched ahead at once (capped by SCRAPER_MAX_CONCURRENCY_PER_HOST),
+    paced by the host's adaptive rate limiter; with a `delay`, each fetch after the first round
+    also waits that long before its request, so results are handed over without the wait. Links already yielded for an
+    earlier page are dropped, and discovery stops at the first page with no cards or only links seen
+    before: the site has run out of results, so the pages fetched ahead of it are discarded and no
+    further ones are requested.
+    """
+    concurrency = max(1, min(concurrency, SCRAPER_MAX_CONCURRENCY_PER_HOST))
+    pages = iter(range(start_page, max_pages + 1))
+    seen = set()
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def submit_next(wait):
+        for page in islice(pages, 1):
+            pending.append((page, executor.submit(contextvars.copy_context().run, _polite_fetch_listing_page,
+                                                  page_url, page, wait)))
+
+    try:
+        for _ in range(concurrency):
+            submit_next(0)
+        while pending:
+            page, future = pending.popleft()
+            listings = future.result()
+            submit_next(delay)
+            if listings is None:
+                continue
+
+            new_listings = []
+            for listing in listings:
+                key = normalize_listing_url(listing["link"])
+                if key not in seen:
+                    seen.add(key)
+                    new_listings.append(listing)
+            if not new_listings:
+                print(f"Listing page {page} has no new listings, stopping discovery")
+                return
+
+            yield page, new_listings
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_listing_pages(page_url, max_pages=1, start_page=1):
+    """Yields the listings of each listing page as soon as that page has been scraped"""
+    for _, listings in iter_numbered_listing_pages(page_url, max_pages, start_page):
+        yield listings
+
+
+def scrape_main_listings(page_url, max_pages=1):
+    listings = []
+    for page_listings in iter_listing_pages(page_url, max_pages):
+        listings.extend(page_listings)
     return listings
 
 
@@ -81,6 +455,86 @@ def extract_text_safely(element):
     return None
 
 
+# Spec patterns per field, in priority order: the first pattern that matches anywhere in the
+# page wins, and its leftmost match is used. Each pattern is paired with the literal(s) it
+# cannot match without, so patterns whose keyword isn't on the page are never run.
+SPEC_PATTERNS = [
+    ("area_m2", "Area", [
+        (r'(\d+(?:\.\d+)?)\s*m[²2]', ('m²', 'm2')),
+        (r'(\d+(?:\.\d+)?)\s*metros?\s*cuadrados?', ('cuadrado',)),
+        (r'área:?\s*(\d+(?:\.\d+)?)\s*m[²2]', ('área',)),
+        (r'size:?\s*(\d+(?:\.\d+)?)\s*m[²2]', ('size',)),
+        (r'<strong>área:</strong>\s*(\d+(?:\.\d+)?)\s*m[²2]', ('<strong>',)),
+        (r'superficie:?\s*(\d+(?:\.\d+)?)\s*m[²2]', ('superficie',))
+    ]),
+    ("bedrooms", "Bedrooms", [
+        (r'(\d+)\s*habitacion(?:es)?', ('habitacion',)),
+        (r'(\d+)\s*recámaras?', ('recámara',)),
+        (r'(\d+)\s*dormitorios?', ('dormitorio',)),
+        (r'(\d+)\s*bedrooms?', ('bedroom',)),
+        (r'(\d+)\s*hab\b', ('hab',)),
+        (r'habitaciones?:?\s*(\d+)', ('habitacione',)),
+        (r'bedrooms?:?\s*(\d+)', ('bedroom',)),
+        (r'recámaras?:?\s*(\d+)', ('recámara',)),
+        (r'<strong>recámaras:</strong>\s*(\d+)', ('<strong>',)),
+        (r'(\d+)-(\d+)\s*recámaras?', ('recámara',))  # Range pattern like "2-3 recámaras" (takes the first number)
+    ]),
+    ("bathrooms", "Bathrooms", [
+        (r'(\d+(?:\.\d+)?)\s*baños?', ('baño',)),
+        (r'(\d+(?:\.\d+)?)\s*bathrooms?', ('bathroom',)),
+        (r'baños?:?\s*(\d+(?:\.\d+)?)', ('baño',)),
+        (r'bathrooms?:?\s*(\d+(?:\.\d+)?)', ('bathroom',)),
+        (r'<strong>baños:</strong>\s*(\d+(?:\.\d+)?)', ('<strong>',))
+    ]),
+    ("parking", "Parking", [
+        (r'(\d+)\s*estacionamientos?', ('estacionamiento',)),
+        (r'(\d+)\s*parking\s*spaces?', ('parking',)),
+        (r'(\d+)\s*garajes?', ('garaje',)),
+        (r'estacionamientos?:?\s*(\d+)', ('estacionamiento',)),
+        (r'parking:?\s*(\d+)', ('parking',)),
+        (r'estacionamiento:?\s*(\d+)', ('estacionamiento',)),
+        (r'<strong>estacionamiento:</strong>\s*(\d+)', ('<strong>',))
+    ]),
+    ("floor", "Floor", [
+        (r'piso\s*(\d+)', ('piso',)),
+        (r'floor\s*(\d+)', ('floor',)),
+        (r'nivel\s*(\d+)', ('nivel',)),
+        (r'(\d+)(?:er|do|to|th)?\s*piso', ('piso',)),
+        (r'(\d+)(?:er|do|to|th)?\s*floor', ('floor',))
+    ]),
+]
+
+# Compiled once at import: (field, label, [(compiled pattern, casefolded keywords), ...])
+_SPEC_RULES = [
+    (field, label, [(re.compile(pattern, re.IGNORECASE), tuple(k.casefold() for k in keywords))
+                    for pattern, keywords in patterns])
+    for field, label, patterns in SPEC_PATTERNS
+]
+
+SPEC_ELEMENT_RE = re.compile(r'\d+\s*m[²2]|\d+\s*hab|\d+\s*baño|\d+\s*recámara', re.IGNORECASE)
+SPEC_KEY_VALUE_RE = re.compile(r':\s*\d+', re.IGNORECASE)
+SPEC_KEYWORDS = ['área', 'habitacion', 'recámara', 'baño', 'estacionamiento', 'piso']
+
+
+def scan_specs(text):
+    """
+    Resolves every spec field by pattern priority.
+    Returns {field: (label, match)} with the leftmost match of the best pattern that matched.
+    """
+    # Keyword checks on the folded text are far cheaper than a regex scan that finds nothing
+    folded_text = text.casefold()
+    found = {}
+    for field, label, rules in _SPEC_RULES:
+        for pattern, keywords in rules:
+            if not any(keyword in folded_text for keyword in keywords):
+                continue
+            match = pattern.search(text)
+            if match:
+                found[field] = (label, match)
+                break
+    return found
+
+
 def extract_property_specs(soup):
     """Enhanced property specifications extraction"""
     specs = {
@@ -96,128 +550,139 @@ def extract_property_specs(soup):
     all_text = soup.get_text()
 
     # Enhanced pattern matching for common specifications
+    for field, (label, match) in scan_specs(all_text).items():
+        specs[field] = match.group(1)
+        specs["raw_specs"].append(f"{label}: {match.group(0)}")
+
+    # One walk over the text nodes replaces two full-tree find_all searches:
+    # - short spec-like strings that are the sole content of a p/div/span
+    # - short key-value strings (e.g. "Recámaras: 3") mentioning a spec keyword
+    for node in soup.descendants:
+        if not isinstance(node, NavigableString):
+            continue
 
-    # Area in square meters - more comprehensive patterns
-    area_patterns = [
-        r'(\d+(?:\.\d+)?)\s*m[²2]',
-        r'(\d+(?:\.\d+)?)\s*metros?\s*cuadrados?',
-        r'área:?\s*(\d+(?:\.\d+)?)\s*m[²2]',
-        r'size:?\s*(\d+(?:\.\d+)?)\s*m[²2]',
-        r'<strong>área:</strong>\s*(\d+(?:\.\d+)?)\s*m[²2]',
-        r'superficie:?\s*(\d+(?:\.\d+)?)\s*m[²2]'
-    ]
+        if SPEC_ELEMENT_RE.search(node):
+            # Every ancestor whose .string is this node (single-child chain) is a match
+            element = node.parent
+            child = node
+            while element is not None and len(element.contents) == 1 and element.contents[0] is child:
+                if element.name in ('p', 'div', 'span'):
+                    spec_text = element.get_text(strip=True)
+                    if len(spec_text) < 100:  # Avoid long descriptions
+                        specs["raw_specs"].append(spec_text)
+                child = element
+                element = element.parent
+
+        if SPEC_KEY_VALUE_RE.search(node):
+            text = node.strip()
+            if any(keyword in text.lower() for keyword in SPEC_KEYWORDS):
+                if len(text) < 100:  # Avoid long descriptions
+                    specs["raw_specs"].append(text)
+
+    # Remove duplicates from raw_specs (sorted so repeated crawls give identical rows)
+    specs["raw_specs"] = sorted(set(specs["raw_specs"]))
 
-    for pattern in area_patterns:
-        matches = re.finditer(pattern, all_text, re.IGNORECASE)
-        for match in matches:
-            specs["area_m2"] = match.group(1)
-            specs["raw_specs"].append(f"Area: {match.group(0)}")
-            break
-        if specs["area_m2"]:
-            break
-
-    # Bedrooms/Habitaciones - enhanced patterns
-    bedroom_patterns = [
-        r'(\d+)\s*habitacion(?:es)?',
-        r'(\d+)\s*recámaras?',
-        r'(\d+)\s*dormitorios?',
-        r'(\d+)\s*bedrooms?',
-        r'(\d+)\s*hab\b',
-        r'habitaciones?:?\s*(\d+)',
-        r'bedrooms?:?\s*(\d+)',
-        r'recámaras?:?\s*(\d+)',
-        r'<strong>recámaras:</strong>\s*(\d+)',
-        r'(\d+)-(\d+)\s*recámaras?'  # Range pattern like "2-3 recámaras"
-    ]
+    return specs
 
-    for pattern in bedroom_patterns:
-        matches = re.finditer(pattern, all_text, re.IGNORECASE)
-        for match in matches:
-            # Handle range patterns (take the first number)
-            bedroom_count = match.group(1)
-            specs["bedrooms"] = bedroom_count
-            specs["raw_specs"].append(f"Bedrooms: {match.group(0)}")
-            break
-        if specs["bedrooms"]:
-            break
-
-    # Bathrooms/Baños - enhanced patterns
-    bathroom_patterns = [
-        r'(\d+(?:\.\d+)?)\s*baños?',
-        r'(\d+(?:\.\d+)?)\s*bathrooms?',
-        r'baños?:?\s*(\d+(?:\.\d+)?)',
-        r'bathrooms?:?\s*(\d+(?:\.\d+)?)',
-        r'<strong>baños:</strong>\s*(\d+(?:\.\d+)?)'
-    ]
 
-    for pattern in bathroom_patterns:
-        matches = re.finditer(pattern, all_text, re.IGNORECASE)
-        for match in matches:
-            specs["bathrooms"] = match.group(1)
-            specs["raw_specs"].append(f"Bathrooms: {match.group(0)}")
-            break
-        if specs["bathrooms"]:
-            break
-
-    # Parking - enhanced patterns
-    parking_patterns = [
-        r'(\d+)\s*estacionamientos?',
-        r'(\d+)\s*parking\s*spaces?',
-        r'(\d+)\s*garajes?',
-        r'estacionamientos?:?\s*(\d+)',
-        r'parking:?\s*(\d+)',
-        r'estacionamiento:?\s*(\d+)',
-        r'<strong>estacionamiento:</strong>\s*(\d+)'
-    ]
+MODEL_ROOM_WORDS = ['recámara', 'habitacion', 'baño']
+# Longest needle that can span two text nodes; prefixes/suffixes of this length are kept per node
+_MODEL_NEEDLE_OVERLAP = max(len(word) for word in MODEL_ROOM_WORDS + ['m²']) - 1
 
-    for pattern in parking_patterns:
-        matches = re.finditer(pattern, all_text, re.IGNORECASE)
-        for match in matches:
-            specs["parking"] = match.group(1)
-            specs["raw_specs"].append(f"Parking: {match.group(0)}")
-            break
-        if specs["parking"]:
-            break
-
-    # Floor/Piso
-    floor_patterns = [
-        r'piso\s*(\d+)',
-        r'floor\s*(\d+)',
-        r'nivel\s*(\d+)',
-        r'(\d+)(?:er|do|to|th)?\s*piso',
-        r'(\d+)(?:er|do|to|th)?\s*floor'
-    ]
 
-    for pattern in floor_patterns:
-        matches = re.finditer(pattern, all_text, re.IGNORECASE)
-        for match in matches:
-            specs["floor"] = match.group(1)
-            specs["raw_specs"].append(f"Floor: {match.group(0)}")
-            break
-        if specs["floor"]:
-            break
-
-    # Look for structured data in specific HTML elements
-    spec_elements = soup.find_all(['p', 'div', 'span'],
-                                  text=re.compile(r'\d+\s*m[²2]|\d+\s*hab|\d+\s*baño|\d+\s*recámara', re.IGNORECASE))
-    for element in spec_elements:
-        spec_text = element.get_text(strip=True)
-        if len(spec_text) < 100:  # Avoid long descriptions
-            specs["raw_specs"].append(spec_text)
-
-    # Look for key-value pairs in the HTML
-    key_value_elements = soup.find_all(text=re.compile(r':\s*\d+', re.IGNORECASE))
-    for element in key_value_elements:
-        text = element.strip()
-        if any(keyword in text.lower() for keyword in
-               ['área', 'habitacion', 'recámara', 'baño', 'estacionamiento', 'piso']):
-            if len(text) < 100:  # Avoid long descriptions
-                specs["raw_specs"].append(text)
-
-    # Remove duplicates from raw_specs
-    specs["raw_specs"] = list(set(specs["raw_specs"]))
+def model_fingerprint(model_data):
+    """Hashable key that is equal for equal model dicts"""
+    return frozenset(model_data.items())
 
-    return specs
+
+def _model_text_flags(text):
+    """(has m², has a room word) for a piece of text"""
+    return 'm²' in text, any(word in text.lower() for word in MODEL_ROOM_WORDS)
+
+
+def _matches_simple_selector(element, selector):
+    if selector.startswith('.'):
+        return selector[1:] in (element.get('class') or [])
+    return element.name == selector
+
+
+def _is_transparent_to_model_extraction(element):
+    """
+    Whether extract_model_from_element gives the same result on a wrapper whose only content
+    is `element` as on `element` itself: true unless the element is one of the nodes the
+    extraction picks out (title/price selectors, p, strong).
+    """
+    if element.name in ('p', 'strong'):
+        return False
+    return not any(_matches_simple_selector(element, selector)
+                   for selector in MODEL_TITLE_SELECTORS + MODEL_PRICE_SELECTORS)
+
+
+def find_model_divs(soup):
+    """
+    Divs whose text contains a price together with an area or room count (likely a model),
+    in document order, as (div, representative) pairs.
+
+    Equivalent to checking div.get_text() for every div, but the flags of each element are
+    computed once from its children in a single bottom-up pass, so nested divs don't
+    re-serialize the same subtree. Each node keeps the first and last few characters of its
+    text so needles spanning two text nodes are still found.
+
+    `representative` is the innermost element extract_model_from_element gives the same
+    result on: wrappers whose only content is one other element share it, so a chain of
+    nested wrappers only has to be extracted once.
+    """
+    divs = soup.find_all('div', limit=1)
+    if not divs:
+        return []
+    # Same string types div.get_text() considers (no comments, scripts, ...)
+    string_types = divs[0].interesting_string_types or divs[0].MAIN_CONTENT_STRING_TYPES
+    overlap = _MODEL_NEEDLE_OVERLAP
+
+    # id(node) -> (has $, has m², has room word, text prefix, text suffix)
+    flags = {}
+    representatives = {}
+    model_divs = []
+    for node in reversed(list(soup.descendants)):
+        if isinstance(node, NavigableString):
+            text = str(node) if type(node) in string_types else ""
+            has_area, has_rooms = _model_text_flags(text)
+            flags[id(node)] = ('$' in text, has_area, has_rooms, text[:overlap], text[-overlap:])
+            continue
+
+        has_price = has_area = has_rooms = False
+        prefix = tail = ""
+        content_children = []
+        for child in node.contents:
+            child_price, child_area, child_rooms, child_prefix, child_suffix = flags[id(child)]
+            has_price = has_price or child_price
+            has_area = has_area or child_area
+            has_rooms = has_rooms or child_rooms
+            if tail and not (has_area and has_rooms):
+                # Needles crossing the boundary between the text so far and this child
+                boundary_area, boundary_rooms = _model_text_flags(tail + child_prefix)
+                has_area = has_area or boundary_area
+                has_rooms = has_rooms or boundary_rooms
+            if len(prefix) < overlap:
+                prefix = (prefix + child_prefix)[:overlap]
+            tail = (tail + child_suffix)[-overlap:]
+
+            if not isinstance(child, NavigableString) or (type(child) in string_types and child.strip()):
+                content_children.append(child)
+        flags[id(node)] = (has_price, has_area, has_rooms, prefix, tail)
+
+        only_child = content_children[0] if len(content_children) == 1 else None
+        if only_child is not None and not isinstance(only_child, NavigableString) \
+                and _is_transparent_to_model_extraction(only_child):
+            representatives[id(node)] = representatives[id(only_child)]
+        else:
+            representatives[id(node)] = node
+
+        if node.name == 'div' and has_price and (has_area or has_rooms):
+            model_divs.append((node, representatives[id(node)]))
+
+    model_divs.reverse()
+    return model_divs
 
 
 def extract_models_enhanced(soup):
@@ -239,14 +704,16 @@ def extract_models_enhanced(soup):
 
     # Strategy 2: Look for structured data in divs that contain model information
     # Find divs that contain price and area information together
-    potential_model_divs = soup.find_all('div')
-    for div in potential_model_divs:
-        div_text = div.get_text()
-        # Check if this div contains both price and area info (likely a model)
-        if ('$' in div_text and 'm²' in div_text) or (
-                '$' in div_text and any(word in div_text.lower() for word in ['recámara', 'habitacion', 'baño'])):
-            model_data = extract_model_from_element(div)
-            if model_data and model_data not in models:
+    seen_models = {model_fingerprint(model) for model in models}
+    extracted = {}  # id(representative) -> model data
+    for div, representative in find_model_divs(soup):
+        if id(representative) not in extracted:
+            extracted[id(representative)] = extract_model_from_element(representative)
+        model_data = extracted[id(representative)]
+        if model_data:
+            fingerprint = model_fingerprint(model_data)
+            if fingerprint not in seen_models:
+                seen_models.add(fingerprint)
                 models.append(model_data)
 
     # Strategy 3: Look for tables with model information
@@ -305,6 +772,19 @@ def extract_models_enhanced(soup):
     return models
 
 
+# Simple selectors only (".class" or tag name): find_model_divs matches them without soupsieve
+MODEL_TITLE_SELECTORS = [".model-title", ".title", "h3", "h4", ".model-name"]
+MODEL_PRICE_SELECTORS = [".model-price", ".price", ".price-tag"]
+
+
+def _select_first(element, selectors):
+    for selector in selectors:
+        found = element.select_one(selector)
+        if found:
+            return found
+    return None
+
+
 def extract_model_from_element(element):
     """Extract model data from a single element"""
     model_data = {}
@@ -313,11 +793,7 @@ def extract_model_from_element(element):
     element_text = element.get_text()
 
     # Extract model title
-    title_elem = (element.select_one(".model-title") or
-                  element.select_one(".title") or
-                  element.select_one("h3") or
-                  element.select_one("h4") or
-                  element.select_one(".model-name"))
+    title_elem = _select_first(element, MODEL_TITLE_SELECTORS)
 
     if title_elem:
         model_data["model_title"] = extract_text_safely(title_elem)
@@ -328,9 +804,7 @@ def extract_model_from_element(element):
             model_data["model_title"] = modelo_match.group(0).strip()
 
     # Extract price
-    price_elem = (element.select_one(".model-price") or
-                  element.select_one(".price") or
-                  element.select_one(".price-tag"))
+    price_elem = _select_first(element, MODEL_PRICE_SELECTORS)
 
     if price_elem:
         model_data["model_price"] = extract_text_safely(price_elem)
@@ -399,56 +873,209 @@ def extract_model_from_element(element):
     return model_data if len(model_data) > 0 else None
 
 
+def fetch_detail_page(url):
+    """
+    Fetch stage of the detail scraper. Returns (content, cached_result): cached_result is the
+    stored extraction when the page is unchanged since it was last parsed, so content doesn't
+    need parsing again. content is None when the page could not be fetched.
+    """
+    content, unchanged = fetch_content(url)
+    if content is None:
+        return None, None
+
+    # Page hasn't changed since it was last scraped: reuse the stored extraction
+    cache = get_response_cache()
+    if unchanged and cache:
+        cached_result = cache.get_parsed(url, EXTRACTION_VERSION)
+        if cached_result is not None:
+            print(f"Unchanged, reusing cached details for: {url}")
+            return content, cached_result
+    return content, None
+
+
+def parse_detail_content(content):
+    """Parse stage of the detail scraper: raw page bytes in, extracted fields out (runs in parse workers)"""
+    return extract_detail_page(parse_html(content))
+
+
+def timed_parse_detail_content(content):
+    """
+    parse_detail_content, also returning how long it took. Metrics recorded in a parse worker
+    process would never reach /metrics, so the worker hands the duration back to the parent.
+    """
+    start = time.perf_counter()
+    return parse_detail_content(content), time.perf_counter() - start
+
+
+def store_detail_result(url, result):
+    """Logs a freshly parsed detail page and keeps its extraction next to the cached body"""
+    # DEBUG
+    models, amenities, apartment_features = result["models"], result["amenities"], result["apartment_features"]
+    print(f"  ✓ Title: {bool(result['page_title'])} | Price: {bool(result['listing_price'])} | Description: {bool(result['description'])}")
+    print(f"  ✓ Models: {len(models)} | Amenities: {len(amenities)} | Features: {len(apartment_features)}")
+    print(
+        f"  ✓ Benefits: {len(result['additional_benefits'])} | Specs: Area={result['area_m2']}, Beds={result['bedrooms']}, Baths={result['bathrooms']}")
+
+    if models:
+        print(f"  ✓ Sample models: {[m.get('model_title', 'Unnamed') for m in models[:2]]}")
+    if amenities:
+        print(f"  ✓ Sample amenities: {amenities[:3]}")
+    if apartment_features:
+        print(f"  ✓ Sample features: {apartment_features[:3]}")
+
+    cache = get_response_cache()
+    if cache:
+        cache.put_parsed(url, result, EXTRACTION_VERSION)
+
+
 def scrape_detail_page(url):
     """Enhanced detail scraper with improved strategies for property pages"""
-    soup = get_soup(url)
-    if not soup:
+    content, cached_result = fetch_detail_page(url)
+    if content is None:
         return {}
+    if cached_result is not None:
+        return cached_result
 
     print(f"Scraping details from: {url}")
+    with metrics.PARSE_SECONDS.labels("detail").time():
+        result = parse_detail_content(content)
+    store_detail_result(url, result)
+    return result
 
-    # Enhanced title extraction
-    title = None
-    title_selectors = [
-        "h1", ".title", ".property-title", ".listing-title", ".ad-title",
-        ".header h1", ".main-title", "[class*='title']"
-    ]
 
-    for selector in title_selectors:
-        elem = soup.select_one(selector)
-        if elem:
-            title = extract_text_safely(elem)
-            if title and len(title) > 5:  # Ensure we got a meaningful title
-                break
+DESCRIPTION_KEYWORDS = ["descripción", "description", "proyecto", "detalles", "sobre", "acerca"]
+AMENITY_KEYWORDS = ["amenidades", "amenities", "servicios", "instalaciones", "comodidades", "facilidades"]
+FEATURE_KEYWORDS = ["características", "features", "apartamento", "incluye", "cuenta con", "dispone"]
+BENEFIT_KEYWORDS = ["beneficios", "benefits", "adicionales", "ventajas", "plus"]
 
-    # Enhanced subtitle extraction
-    subtitle = None
-    subtitle_selectors = [
-        ".subtitle", ".property-subtitle", ".listing-subtitle", "h2",
-        ".location-info", ".address", "[class*='subtitle']"
-    ]
+# div class patterns looked up by extract_detail_page
+AMENITY_GRID_CLASS = re.compile('amenity|grid')
+FEATURE_LIST_CLASS = re.compile('benefit|feature')
+BENEFIT_CLASS = re.compile('benefit')
+AMENITY_CLASSES = [re.compile(pattern, re.IGNORECASE) for pattern in ['amenity', 'feature', 'benefit', 'service']]
 
-    for selector in subtitle_selectors:
-        elem = soup.select_one(selector)
-        if elem:
-            subtitle = extract_text_safely(elem)
-            if subtitle and len(subtitle) > 5:
-                break
 
-    # Enhanced price extraction
-    listing_price = None
-    price_selectors = [
-        ".price-tag", ".price", ".listing-price", ".property-price",
-        "[class*='price']", ".cost", ".valor"
-    ]
+class PageIndex:
+    """
+    One walk over a parsed page that indexes what extract_detail_page looks up: text nodes
+    by the keywords they contain (case-insensitive), elements by tag name and divs by class
+    pattern. Subtree queries are answered by document position, so they don't walk the tree
+    again. Results are in document order, like the equivalent find_all calls.
+    """
 
-    for selector in price_selectors:
-        elem = soup.select_one(selector)
-        if elem:
-            price_text = extract_text_safely(elem)
-            if price_text and '$' in price_text:
-                listing_price = price_text
-                break
+    keywords = DESCRIPTION_KEYWORDS + AMENITY_KEYWORDS + FEATURE_KEYWORDS + BENEFIT_KEYWORDS
+    class_patterns = [AMENITY_GRID_CLASS, FEATURE_LIST_CLASS, BENEFIT_CLASS] + AMENITY_CLASSES
+
+    _keyword_res = {keyword: re.compile(keyword, re.IGNORECASE) for keyword in keywords}
+    # Rejects the (many) text nodes that contain no keyword with a single search
+    _any_keyword_re = re.compile("|".join(f"(?:{keyword})" for keyword in keywords), re.IGNORECASE)
+
+    def __init__(self, soup):
+        self.soup = soup
+        self.nodes = []
+        self._position = {}  # id(tag) -> document position
+        self._end = {}  # id(tag) -> position of its last descendant
+        self._by_name = {}  # tag name -> positions
+        self._by_class = {pattern: [] for pattern in self.class_patterns}
+        self._texts = {keyword: [] for keyword in self.keywords}
+        self._merged = {}
+        self._text_cache = {}
+
+        open_tags = []
+        for position, node in enumerate([soup, *soup.descendants]):
+            self.nodes.append(node)
+            while open_tags and open_tags[-1] is not node.parent:
+                self._end[id(open_tags.pop())] = position - 1
+
+            if isinstance(node, NavigableString):
+                if self._any_keyword_re.search(node):
+                    for keyword, keyword_re in self._keyword_res.items():
+                        if keyword_re.search(node):
+                            self._texts[keyword].append(node)
+                continue
+
+            open_tags.append(node)
+            self._position[id(node)] = position
+            self._by_name.setdefault(node.name, []).append(position)
+            if node.name == 'div':
+                classes = node.get('class')
+                if classes:
+                    classes = classes if isinstance(classes, str) else " ".join(classes)
+                    for pattern in self.class_patterns:
+                        if pattern.search(classes):
+                            self._by_class[pattern].append(position)
+
+        for tag in open_tags:
+            self._end[id(tag)] = len(self.nodes) - 1
+
+    def texts_with(self, keyword):
+        """Text nodes containing `keyword`, like soup.find_all(text=re.compile(keyword, re.I))"""
+        return self._texts[keyword]
+
+    def find_all(self, parent, names=None, class_pattern=None):
+        """Descendants of `parent` with one of the tag `names`, or divs whose class matches `class_pattern`"""
+        if class_pattern is not None:
+            positions = self._by_class[class_pattern]
+        else:
+            key = tuple(names)
+            positions = self._merged.get(key)
+            if positions is None:
+                positions = sorted(p for name in names for p in self._by_name.get(name, []))
+                self._merged[key] = positions
+
+        first = bisect.bisect_right(positions, self._position[id(parent)])
+        last = bisect.bisect_right(positions, self._end[id(parent)])
+        return [self.nodes[p] for p in positions[first:last]]
+
+    def find_heading(self, keyword):
+        """First h1-h4 whose .string contains `keyword`, like soup.find([...], text=re.compile(...))"""
+        keyword_re = self._keyword_res[keyword]
+        for heading in self.find_all(self.soup, ['h1', 'h2', 'h3', 'h4']):
+            if heading.string is not None and keyword_re.search(heading.string):
+                return heading
+        return None
+
+    def text(self, element):
+        """extract_text_safely, computed once per element"""
+        key = id(element)
+        if key not in self._text_cache:
+            self._text_cache[key] = extract_text_safely(element)
+        return self._text_cache[key]
+
+
+def _meaningful_text(text):
+    return bool(text) and len(text) > 5
+
+
+def _price_text(text):
+    return bool(text) and '$' in text
+
+
+# Fallback selectors of the detail page header fields, the costly [class*=...] ones last
+TITLE_SELECTORS = selector_stats.chain("title", [
+    "h1", ".title", ".property-title", ".listing-title", ".ad-title",
+    ".header h1", ".main-title", "[class*='title']"
+])
+SUBTITLE_SELECTORS = selector_stats.chain("subtitle", [
+    ".subtitle", ".property-subtitle", ".listing-subtitle", "h2",
+    ".location-info", ".address", "[class*='subtitle']"
+])
+PRICE_SELECTORS = selector_stats.chain("price", [
+    ".price-tag", ".price", ".listing-price", ".property-price",
+    "[class*='price']", ".cost", ".valor"
+])
+
+
+def extract_detail_page(soup):
+    """Extracts the detail fields from a parsed property page (no network access)"""
+    # Enhanced title extraction (falls back to a short title when there is no meaningful one)
+    title = TITLE_SELECTORS.first(soup, extract_text_safely, _meaningful_text, fallback=True)
+
+    # Enhanced subtitle extraction
+    subtitle = SUBTITLE_SELECTORS.first(soup, extract_text_safely, _meaningful_text, fallback=True)
+
+    # Enhanced price extraction
+    listing_price = PRICE_SELECTORS.first(soup, extract_text_safely, _price_text)
 
     # If no price found in elements, search in text
     if not listing_price:
@@ -457,18 +1084,19 @@ def scrape_detail_page(url):
         if price_match:
             listing_price = price_match.group(0)
 
+    index = PageIndex(soup)
+
     # Enhanced description extraction
     description = None
-    desc_keywords = ["descripción", "description", "proyecto", "detalles", "sobre", "acerca"]
 
-    for keyword in desc_keywords:
+    for keyword in DESCRIPTION_KEYWORDS:
         # Look for headings with the keyword
-        heading = soup.find(['h1', 'h2', 'h3', 'h4'], text=re.compile(keyword, re.IGNORECASE))
+        heading = index.find_heading(keyword)
         if heading:
             # Get the next content elements
             next_elements = heading.find_next_siblings(['p', 'div'])
             for elem in next_elements:
-                elem_text = extract_text_safely(elem)
+                elem_text = index.text(elem)
                 if elem_text and len(elem_text) > 20:
                     description = elem_text
                     break
@@ -476,101 +1104,94 @@ def scrape_detail_page(url):
                 break
 
         # Look for text containing the keyword
-        desc_elem = soup.find(text=re.compile(keyword, re.IGNORECASE))
-        if desc_elem:
-            parent = desc_elem.find_parent()
+        matching_texts = index.texts_with(keyword)
+        if matching_texts:
+            parent = matching_texts[0].parent
             if parent:
                 # Look for content in the same card/section
-                content_elem = parent.find(['p', 'div'])
-                if content_elem:
-                    desc_text = extract_text_safely(content_elem)
+                content_elems = index.find_all(parent, ['p', 'div'])
+                if content_elems:
+                    desc_text = index.text(content_elems[0])
                     if desc_text and len(desc_text) > 20:
                         description = desc_text
                         break
 
     models = extract_models_enhanced(soup)
     amenities = []
-    amenity_keywords = ["amenidades", "amenities", "servicios", "instalaciones", "comodidades", "facilidades"]
 
-    for keyword in amenity_keywords:
+    # Several matching text nodes often share a parent; its items were already collected
+    searched_parents = set()
+    for keyword in AMENITY_KEYWORDS:
         # Look for sections with amenity keywords
-        matching_elements = soup.find_all(text=re.compile(keyword, re.IGNORECASE))
-        for element in matching_elements:
-            parent = element.find_parent()
-            if parent:
+        for element in index.texts_with(keyword):
+            parent = element.parent
+            if parent and id(parent) not in searched_parents:
+                searched_parents.add(id(parent))
                 # Look for grid patterns (common for amenities)
-                amenity_divs = parent.find_all('div', class_=re.compile('amenity|grid'))
-                for div in amenity_divs:
-                    amenity_text = extract_text_safely(div)
+                for div in index.find_all(parent, class_pattern=AMENITY_GRID_CLASS):
+                    amenity_text = index.text(div)
                     if amenity_text and len(amenity_text.strip()) > 2 and len(amenity_text) < 50:
                         amenities.append(amenity_text.strip())
 
                 # Look for lists
-                nearby_lists = parent.find_all(["ul", "ol"])
-                for ul in nearby_lists:
-                    for li in ul.find_all("li"):
-                        amenity_text = extract_text_safely(li)
+                for ul in index.find_all(parent, ["ul", "ol"]):
+                    for li in index.find_all(ul, ["li"]):
+                        amenity_text = index.text(li)
                         if amenity_text and len(amenity_text.strip()) > 2:
                             amenities.append(amenity_text.strip())
 
     # Look for divs with amenity-like classes
-    amenity_class_patterns = ['amenity', 'feature', 'benefit', 'service']
-    for pattern in amenity_class_patterns:
-        elements = soup.find_all('div', class_=re.compile(pattern, re.IGNORECASE))
-        for elem in elements:
-            amenity_text = extract_text_safely(elem)
+    for pattern in AMENITY_CLASSES:
+        for elem in index.find_all(soup, class_pattern=pattern):
+            amenity_text = index.text(elem)
             if amenity_text and 2 < len(amenity_text) < 50:
                 amenities.append(amenity_text.strip())
 
     # Enhanced apartment features extraction
     apartment_features = []
-    feature_keywords = ["características", "features", "apartamento", "incluye", "cuenta con", "dispone"]
 
-    for keyword in feature_keywords:
-        matching_elements = soup.find_all(text=re.compile(keyword, re.IGNORECASE))
-        for element in matching_elements:
-            parent = element.find_parent()
-            if parent:
+    searched_parents = set()
+    for keyword in FEATURE_KEYWORDS:
+        for element in index.texts_with(keyword):
+            parent = element.parent
+            if parent and id(parent) not in searched_parents:
+                searched_parents.add(id(parent))
                 # Look for benefit-list class or similar patterns
-                benefit_elements = parent.find_all('div', class_=re.compile('benefit|feature'))
-                for div in benefit_elements:
-                    feature_text = extract_text_safely(div)
+                for div in index.find_all(parent, class_pattern=FEATURE_LIST_CLASS):
+                    feature_text = index.text(div)
                     if feature_text and len(feature_text.strip()) > 3:
                         apartment_features.append(feature_text.strip())
 
                 # Look for lists
-                nearby_lists = parent.find_all(["ul", "ol"])
-                for ul in nearby_lists:
-                    for li in ul.find_all("li"):
-                        feature_text = extract_text_safely(li)
+                for ul in index.find_all(parent, ["ul", "ol"]):
+                    for li in index.find_all(ul, ["li"]):
+                        feature_text = index.text(li)
                         if feature_text and len(feature_text.strip()) > 3:
                             apartment_features.append(feature_text.strip())
 
-    benefit_elements = soup.find_all('div', class_=re.compile('benefit'))
-    for elem in benefit_elements:
-        benefit_text = extract_text_safely(elem)
+    for elem in index.find_all(soup, class_pattern=BENEFIT_CLASS):
+        benefit_text = index.text(elem)
         if benefit_text and len(benefit_text.strip()) > 3:
             apartment_features.append(benefit_text.strip())
 
     # Enhanced additional benefits extraction
     additional_benefits = []
-    benefits_keywords = ["beneficios", "benefits", "adicionales", "ventajas", "plus"]
 
-    for keyword in benefits_keywords:
-        benefits_sections = soup.find_all(text=re.compile(keyword, re.IGNORECASE))
-        for section in benefits_sections:
-            parent = section.find_parent()
-            if parent:
-                benefit_elems = parent.find_all(["li", "div", "p"])
-                for elem in benefit_elems:
-                    benefit_text = extract_text_safely(elem)
+    searched_parents = set()
+    for keyword in BENEFIT_KEYWORDS:
+        for section in index.texts_with(keyword):
+            parent = section.parent
+            if parent and id(parent) not in searched_parents:
+                searched_parents.add(id(parent))
+                for elem in index.find_all(parent, ["li", "div", "p"]):
+                    benefit_text = index.text(elem)
                     if benefit_text and 3 < len(benefit_text) < 100:
                         additional_benefits.append(benefit_text)
 
     property_specs = extract_property_specs(soup)
-    amenities = list(set([a for a in amenities if a]))
-    apartment_features = list(set([f for f in apartment_features if f]))
-    additional_benefits = list(set([b for b in additional_benefits if b]))
+    amenities = sorted(set([a for a in amenities if a]))
+    apartment_features = sorted(set([f for f in apartment_features if f]))
+    additional_benefits = sorted(set([b for b in additional_benefits if b]))
 
     result = {
         "page_title": title,
@@ -589,20 +1210,267 @@ def scrape_detail_page(url):
         "property_specs_raw": property_specs.get("raw_specs", [])
     }
 
-    # DEBUG
-    print(f"  ✓ Title: {bool(title)} | Price: {bool(listing_price)} | Description: {bool(description)}")
-    print(f"  ✓ Models: {len(models)} | Amenities: {len(amenities)} | Features: {len(apartment_features)}")
-    print(
-        f"  ✓ Benefits: {len(additional_benefits)} | Specs: Area={property_specs.get('area_m2')}, Beds={property_specs.get('bedrooms')}, Baths={property_specs.get('bathrooms')}")
+    return result
 
-    if models:
-        print(f"  ✓ Sample models: {[m.get('model_title', 'Unnamed') for m in models[:2]]}")
-    if amenities:
-        print(f"  ✓ Sample amenities: {amenities[:3]}")
-    if apartment_features:
-        print(f"  ✓ Sample features: {apartment_features[:3]}")
 
-    return result
+# --- CONCURRENT DETAIL FETCHING ---
+SCRAPER_CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", "4"))
+# Politeness ceiling: never more than this many requests in flight against one host, across every pool (see host_slots)
+SCRAPER_MAX_CONCURRENCY_PER_HOST = int(os.getenv("SCRAPER_MAX_CONCURRENCY_PER_HOST", "8"))
+# Extra pause each worker keeps after its request, on top of the adaptive rate limit (0: the limiter alone paces)
+SCRAPER_REQUEST_DELAY = float(os.getenv("SCRAPER_REQUEST_DELAY", "0"))
+
+
+# Processes running the BeautifulSoup/regex extraction; 0 parses on the fetching threads instead
+SCRAPER_PARSE_WORKERS = int(os.getenv("SCRAPER_PARSE_WORKERS", str(os.cpu_count() or 1)))
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool():
+    """Returns the shared process pool detail pages are parsed on"""
+    global _parse_pool
+    if _parse_pool is None:
+        with _parse_pool_lock:
+            if _parse_pool is None:
+                # spawn: forking a process that already runs fetch threads can deadlock the child
+                _parse_pool = ProcessPoolExecutor(max_workers=SCRAPER_PARSE_WORKERS,
+                                                  mp_context=multiprocessing.get_context("spawn"))
+    return _parse_pool
+
+
+def _reset_parse_pool(broken):
+    """Drops the shared parse pool once a worker died in it, so the next get_parse_pool() builds a new one"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is broken:
+            _parse_pool = None
+            broken.shutdown(wait=False, cancel_futures=True)
+
+
+def submit_parse(fn, *args, retry=True):
+    """
+    Runs fn(*args) on the shared parse pool and returns a Future of its result. A worker crash
+    (e.g. killed for memory) breaks a ProcessPoolExecutor for good: the pool is then replaced
+    and the task tried once more on the new one before its future fails.
+    """
+    pool = get_parse_pool()
+    outcome = Future()
+
+    def retry_or_fail(error):
+        _reset_parse_pool(pool)
+        if not retry:
+            print(f"Parse worker crashed again, giving up on the task: {error}")
+            _settle(outcome, exception=error)
+            return
+        print(f"Parse worker crashed ({error}), retrying the task on a new parse pool")
+        try:
+            again = submit_parse(fn, *args, retry=False)
+        except BrokenProcessPool as e:
+            _settle(outcome, exception=e)
+            return
+        again.add_done_callback(lambda future: _settle(outcome, source=future))
+
+    def done(future):
+        if future.cancelled():
+            outcome.cancel()
+            return
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            retry_or_fail(error)
+        else:
+            _settle(outcome, source=future)
+
+    try:
+        task = pool.submit(fn, *args)
+    except BrokenProcessPool as e:
+        retry_or_fail(e)
+        return outcome
+    # Cancelling the returned future (e.g. a re-parse stopped early) cancels the queued task
+    outcome.add_done_callback(lambda future: future.cancelled() and task.cancel())
+    task.add_done_callback(done)
+    return outcome
+
+
+def _settle(target, source=None, exception=None):
+    """Resolves `target` like the finished future `source`, or with `exception`, unless it was cancelled"""
+    try:
+        if source is not None and source.cancelled():
+            target.cancel()
+        elif source is not None and source.exception() is None:
+            target.set_result(source.result())
+        else:
+            target.set_exception(exception if source is None else source.exception())
+    except InvalidStateError:
+        pass
+
+
+def _polite_fetch_detail(url, delay):
+    """Run fetch_detail_page, then keep the worker busy for `delay` seconds"""
+    fetched = fetch_detail_page(url)
+    if delay:
+        time.sleep(delay)
+    return fetched
+
+
+def _copy_parse_outcome(source, target, profiler=None):
+    """Resolves `target` with the result or exception of the finished timed parse `source`"""
+    try:
+        if profiler is None:
+            result, seconds = source.result()
+        else:
+            (result, seconds), profiled = source.result()
+            profiler.add("parse", profiled)
+    except Exception as e:
+        target.set_exception(e)
+        return
+    metrics.PARSE_SECONDS.labels("detail").observe(seconds)
+    target.set_result((result, True))
+
+
+def scrape_detail_pages(listings, concurrency=SCRAPER_CONCURRENCY, delay=SCRAPER_REQUEST_DELAY,
+                        parse_workers=SCRAPER_PARSE_WORKERS, profiler=None):
+    """
+    Scrape the detail page of each listing, yielding (listing, detail) pairs in the same
+    order as `listings`.
+
+    Fetching and parsing are separate stages: `concurrency` threads download pages (capped
+    by SCRAPER_MAX_CONCURRENCY_PER_HOST, since all detail pages live on the same host, paced
+    by its adaptive rate limiter and each followed by `delay` seconds before the thread takes
+    the next URL), and as soon as a page arrives its bytes go to the shared process pool for
+    extraction, so parsing runs on every core instead of competing with the fetch threads for
+    the GIL. With
+    `parse_workers=0` pages are parsed on the fetch threads.
+
+    `listings` can be any iterable (e.g. a generator over listing pages); it is consumed
+    lazily and only a bounded window of listings is in flight across both stages, so a slow
+    stage holds the other back and memory stays flat.
+
+    With a `profiler` (profiling.JobProfiler), the fetch and parse stages are profiled;
+    without one the stage functions are used as they are.
+    """
+    concurrency = max(1, min(concurrency, SCRAPER_MAX_CONCURRENCY_PER_HOST))
+    use_pool = parse_workers > 0
+    window = max(concurrency, parse_workers) * 2
+
+    fetch = _polite_fetch_detail
+    parse = parse_detail_content
+    pool_parse = (timed_parse_detail_content,)
+    if profiler is not None:
+        fetch = profiler.wrap("fetch", fetch)
+        parse = profiler.wrap("parse", parse)
+        pool_parse = (profiling.run_profiled, timed_parse_detail_content)
+
+    def start(executor, url):
+        """Submits the fetch of `url`; the returned future resolves to (detail, parsed_now)"""
+        detail = Future()
+
+        def fetched(fetch_future):
+            try:
+                content, cached_result = fetch_future.result()
+                if content is None:
+                    detail.set_result(({}, False))
+                elif cached_result is not None:
+                    detail.set_result((cached_result, False))
+                elif not use_pool:
+                    print(f"Scraping details from: {url}")
+                    with metrics.PARSE_SECONDS.labels("detail").time():
+                        parsed = parse(content)
+                    detail.set_result((parsed, True))
+                else:
+                    print(f"Scraping details from: {url}")
+                    submit_parse(*pool_parse, content).add_done_callback(
+                        lambda parse_future: _copy_parse_outcome(parse_future, detail, profiler))
+            except Exception as e:
+                detail.set_exception(e)
+
+        # The fetch runs in the caller's context, so it counts towards its job's cache stats
+        executor.submit(contextvars.copy_context().run, fetch, url, delay).add_done_callback(fetched)
+        return detail
+
+    def result(listing, future):
+        try:
+            detail, parsed_now = future.result()
+        except Exception as e:
+            print(f"Error scraping detail page: {e}")
+            return listing, {}
+        if parsed_now:
+            store_detail_result(listing["link"], detail)
+        return listing, detail
+
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        for listing in listings:
+            pending.append((listing, start(executor, listing["link"])))
+            if len(pending) >= window:
+                yield result(*pending.popleft())
+        while pending:
+            yield result(*pending.popleft())
+    finally:
+        # If the consumer stops early (e.g. a cancelled job), drop the fetches not started yet
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+# --- OFFLINE RE-PARSE ---
+REPARSE_CHUNK = int(os.getenv("REPARSE_CHUNK", "32"))  # Archived pages handed to a parse worker at a time
+
+
+def parse_archived_pages(directory, kind, locations):
+    """
+    Parse-worker task: reads archived pages straight from their segments and extracts them.
+    A page that fails to extract comes back as None instead of failing the whole chunk.
+    """
+    parse = parse_listing_page if kind == raw_archive.LISTING else parse_detail_content
+    results = []
+    for segment, offset, length in locations:
+        try:
+            results.append(parse(raw_archive.read_blob(directory, segment, offset, length)))
+        except Exception as e:
+            print(f"Error re-parsing archived page {segment}@{offset}: {e}")
+            results.append(None)
+    return results
+
+
+def reparse_archived_pages(kind, since=None, archive=None, parse_workers=SCRAPER_PARSE_WORKERS):
+    """
+    Runs the extraction again over the latest archived copy of every page of `kind`
+    (raw_archive.LISTING or raw_archive.DETAIL), fetched at or after `since` when given, and
+    yields (url, fetched_at, result) for every page that extracted. Nothing is fetched: the
+    pages are read from the archive in chunks of REPARSE_CHUNK by the parse pool, so the run is
+    bound by the cores, not by crawl politeness. With `parse_workers=0` it parses in-process.
+    """
+    archive = archive or get_raw_archive()
+    if archive is None:
+        raise RuntimeError("The raw page archive is disabled (RAW_ARCHIVE_ENABLED=0)")
+    entries = archive.latest(kind, since)
+    chunks = [entries[i:i + REPARSE_CHUNK] for i in range(0, len(entries), REPARSE_CHUNK)]
+
+    def results(chunk, extracted):
+        for (url, fetched_at, *_), result in zip(chunk, extracted):
+            if result is not None:
+                yield url, fetched_at, result
+
+    if parse_workers <= 0:
+        for chunk in chunks:
+            yield from results(chunk, parse_archived_pages(archive.directory, kind, [e[2:] for e in chunk]))
+        return
+
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append((chunk, submit_parse(parse_archived_pages, archive.directory, kind,
+                                                [e[2:] for e in chunk])))
+            if len(pending) >= parse_workers * 2:
+                chunk, future = pending.popleft()
+                yield from results(chunk, future.result())
+        while pending:
+            chunk, future = pending.popleft()
+            yield from results(chunk, future.result())
+    finally:
+        for _, future in pending:
+            future.cancel()
 
 
 def flatten_models(models):
@@ -676,32 +1544,45 @@ def parse_list(val):
 
     if isinstance(val, list):
         # Chequear si todos los elementos son strings (hashables)
-        if all(isinstance(item, str) for item in val):
-            return list(set(val))  # quitar duplicados
+        if all(map(isinstance, val, repeat(str))):
+            return sorted(set(val))  # quitar duplicados, orden estable entre corridas
         return val  # lista de dicts o mixto, devolver tal cual
 
     if isinstance(val, str):
         val = val.strip()
         if val == "":
             return []
-        try:
-            parsed = ast.literal_eval(val)
-            if isinstance(parsed, list):
-                # Lista parseada, procesar como lista original
-                return parse_list(parsed)
-        except:
-            pass
+        # Sin '[' no puede salir una lista de literal_eval: evitamos compilar el texto
+        if "[" in val:
+            try:
+                parsed = ast.literal_eval(val)
+                if isinstance(parsed, list):
+                    # Lista parseada, procesar como lista original
+                    return parse_list(parsed)
+            except:
+                pass
         # Si no se pudo parsear, asumimos lista separada por comas
-        return list({item.strip() for item in val.split(',') if item.strip()})
+        return sorted({item.strip() for item in val.split(',') if item.strip()})
 
     return []
 
 
+def parse_list_column(values):
+    """parse_list over a Series, with the common case (a list of strings) inlined"""
+    return pd.Series([
+        sorted(set(value)) if type(value) is list and all(map(isinstance, value, repeat(str))) else parse_list(value)
+        for value in values.tolist()
+    ], index=values.index, dtype=object)
+
+
 def extract_numeric_from_specs(row, field, key):
     """Extrae número desde property_specs_raw si no hay otro."""
     if pd.notna(row[field]):
         return row[field]
     raw = row.get('property_specs_raw', '')
+    if not isinstance(raw, list):
+        # Fila sin detalle (p. ej. falló la descarga): NaN en vez de lista
+        return np.nan
     # Busca patrón "Bedrooms: X habitaciones"
     prefix = f"{key}: "
     for part in raw:
@@ -713,17 +1594,209 @@ def extract_numeric_from_specs(row, field, key):
     return np.nan
 
 
+# Columns scrape_detail_page fills in; rows whose detail page failed don't have them
+DETAIL_FIELDS = [
+    "page_title", "subtitle", "listing_price", "description", "models", "amenities",
+    "apartment_features", "additional_benefits", "area_m2", "bedrooms", "bathrooms",
+    "parking", "floor", "property_specs_raw"
+]
+
+# Values these patterns accept are converted in bulk; anything else falls back to the
+# scalar helpers above so the cleaned output stays exactly the same
+PLAIN_NUMBER_RE = r"[0-9]+(?:\.[0-9]+)?"
+PRICE_NOISE_RE = r"B/\.|\$|,"
+PLAIN_PRICE_RE = rf"\A({PLAIN_NUMBER_RE})(?:-|\Z)"
+PLAIN_INT_RE = r"\A\s*([0-9]{1,15})\s*\Z"
+
+
+def _text_values(series):
+    """The entries of `series` that are str instances, as a Series the .str accessor accepts"""
+    if isinstance(series.dtype, pd.StringDtype):
+        return series[series.notna()]
+    return series[series.map(type).eq(str)].astype(object)
+
+
+def _convert_column(values, pattern, convert, fallback, text=None):
+    """
+    Converts the text values matching `pattern` (first group) in bulk with `convert` and the
+    remaining non-null values one by one with `fallback`. Returns a float Series.
+    """
+    result = pd.Series(np.nan, index=values.index, dtype=float)
+    if text is None:
+        text = _text_values(values)
+    plain = text.str.extract(pattern, expand=False).dropna()
+    result[plain.index] = convert(plain)
+
+    unusual = values.index.difference(plain.index)
+    unusual = unusual[values[unusual].notna().to_numpy()]
+    if len(unusual):
+        result[unusual] = values[unusual].map(fallback).astype(float)
+    return result
+
+
+def clean_price_column(prices):
+    """Vectorized clean_price over a Series"""
+    text = _text_values(prices).str.replace(PRICE_NOISE_RE, "", regex=True)
+    # astype(float) goes through float() like clean_price; to_numeric rounds long decimals differently
+    return _convert_column(prices, PLAIN_PRICE_RE, lambda plain: plain.astype(object).astype(float),
+                           clean_price, text=text)
+
+
+def parse_int_column(values):
+    """Vectorized parse_int over a Series"""
+    return _convert_column(values, PLAIN_INT_RE, lambda plain: pd.to_numeric(plain).astype(float), parse_int)
+
+
+def numeric_from_specs_column(df_raw, field, key):
+    """
+    Vectorized extract_numeric_from_specs: keeps `field` where it is set and otherwise takes
+    the number after "<key>: " in the first spec line that has one.
+    """
+    result = df_raw[field].astype(float)
+    specs = df_raw.loc[result.isna(), 'property_specs_raw']
+    specs = specs[specs.map(type).eq(list)]
+    if specs.empty:
+        return result
+
+    prefix = f"{key}: "
+    parts = specs.explode().astype(object)
+    parts = parts[parts.str.contains(prefix, regex=False).fillna(False).astype(bool)]
+    # Same token extract_numeric_from_specs reads: the first word after the first prefix
+    tokens = parts.str.extract(f"{re.escape(prefix)}\\s*(\\S+)", expand=False).dropna()
+    tokens = tokens[~tokens.index.duplicated()]
+
+    plain = tokens.str.fullmatch(PLAIN_NUMBER_RE).astype(bool)
+    result[plain[plain].index] = tokens[plain].astype(float)
+    # Tokens like "N/A" or "3habs" may be skipped in favour of a later line: use the scalar path
+    for idx in plain[~plain].index:
+        result[idx] = extract_numeric_from_specs(df_raw.loc[idx], field, key)
+    return result
+
+
+def prepare_raw_frame(rows):
+    """Builds the raw DataFrame from scraped listing+detail rows and applies the initial cleaning"""
+    df_raw = pd.DataFrame(rows)
+    # A listing whose detail page could not be fetched comes with the card fields only
+    df_raw['detail_fetched'] = ["page_title" in row for row in rows]
+    # A detail page re-parsed without its archived listing card has no card fields
+    df_raw['card_found'] = ["card_fingerprint" in row for row in rows]
+    for col in CARD_COLUMNS + DETAIL_FIELDS:
+        if col not in df_raw.columns:
+            df_raw[col] = np.nan
+
+    # Apply initial cleaning from original main.py
+    df_raw['title'] = df_raw['title'].fillna('').str.strip()
+    df_raw['link'] = df_raw['link'].fillna('').str.strip()
+    df_raw = df_raw[df_raw['link'].str.startswith('http')].copy()
+
+    df_raw['price'] = clean_price_column(df_raw['price'])
+    df_raw['area_m2'] = pd.to_numeric(df_raw['area_m2'], errors='coerce')
+
+    df_raw['bedrooms'] = parse_int_column(df_raw['bedrooms'])
+    df_raw['bathrooms'] = parse_int_column(df_raw['bathrooms'])
+    df_raw['parking'] = parse_int_column(df_raw['parking'])
+
+    if 'property_specs_raw' in df_raw.columns:
+        df_raw['bedrooms'] = numeric_from_specs_column(df_raw, 'bedrooms', 'Bedrooms')
+        df_raw['bathrooms'] = numeric_from_specs_column(df_raw, 'bathrooms', 'Bathrooms')
+        df_raw['parking'] = numeric_from_specs_column(df_raw, 'parking', 'Parking')
+
+    for col in ['amenities', 'apartment_features', 'additional_benefits', 'models_flat', 'models']:
+        if col in df_raw.columns:
+            df_raw[col] = parse_list_column(df_raw[col])
+
+    df_raw['description'] = df_raw['description'].fillna('').str.strip()
+    df_raw['subtitle'] = df_raw['subtitle'].fillna('').str.strip()
+    df_raw['page_title'] = df_raw['page_title'].fillna('').str.strip()
+    return df_raw
+
+
+def normalize_listing_url(url):
+    """Canonical form of a listing URL: lowercase scheme/host, no query, fragment or trailing slash"""
+    parts = urlparse(str(url).strip())
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path.rstrip('/')}"
+
+
+def listing_id(url):
+    """Deterministic positive BIGINT id derived from the normalized listing URL"""
+    digest = hashlib.blake2b(normalize_listing_url(url).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFFFFFFFFFFFFFF
+
+
+# Plain http(s) URLs whose normalized form can be built without urlparse: no params,
+# whitespace, brackets or other characters urlparse treats specially
+PLAIN_URL_RE = r"(https?://)([A-Za-z0-9.\-:@_~%]*)(/[A-Za-z0-9\-._~%!$&'()*+,=:@/]*)?(?:[?#][^\s]*)?"
+PLAIN_URL_PATTERN = re.compile(PLAIN_URL_RE)
+
+
+def listing_id_column(urls):
+    """
+    listing_id over a Series of URLs in one pass: plain URLs are normalized from the PLAIN_URL_RE
+    match instead of urlparse, the rest go through listing_id
+    """
+    match = PLAIN_URL_PATTERN.fullmatch
+    blake2b = hashlib.blake2b
+    ids = []
+    for url in urls.astype(str).tolist():
+        plain = match(url.strip())
+        if plain is None:
+            ids.append(listing_id(url))
+            continue
+        scheme, host, path = plain.groups()
+        normalized = scheme + host.lower() + (path or '').rstrip('/')
+        ids.append(int.from_bytes(blake2b(normalized.encode("utf-8"), digest_size=8).digest(), "big")
+                   & 0x7FFFFFFFFFFFFFFF)
+    return pd.Series(ids, index=urls.index, dtype="int64")
+
+
+# List-like columns only go into 'attributes' when non-empty, the others whenever they are not None
+ATTRIBUTE_LIST_COLUMNS = ['amenities', 'apartment_features', 'additional_benefits', 'models']
+ATTRIBUTE_TEXT_COLUMNS = ['property_specs_raw', 'models_flat', 'page_title', 'subtitle', 'listing_price',
+                          'card_fingerprint']
+_ATTRIBUTES_ENCODER = json.JSONEncoder()
+
+
+def _json_fragments(col, values, is_list):
+    """'"col": <json>' for every value that goes into 'attributes', None for the ones left out"""
+    key = encode_basestring_ascii(col) + ": "
+    if not is_list:
+        return [key + encode_basestring_ascii(str(value)) if value is not None else None for value in values]
+    encode = _ATTRIBUTES_ENCODER.encode
+    return [
+        (key + "[" + ", ".join(map(encode_basestring_ascii, value)) + "]"
+         if all(map(isinstance, value, repeat(str))) else key + encode(value)) if value else None
+        for value in values
+    ]
+
+
+def attributes_column(df_raw):
+    """
+    Serializes the 'attributes' JSON for every row, column by column instead of through a
+    row-wise apply. The fragments are encoded exactly like json.dumps does (ASCII escapes,
+    ', ' and ': ' separators), so the output is byte-for-byte the same.
+    """
+    fragments = [_json_fragments(col, df_raw[col].tolist(), True) for col in ATTRIBUTE_LIST_COLUMNS]
+    fragments += [_json_fragments(col, df_raw[col].tolist() if col in df_raw.columns else [None] * len(df_raw), False)
+                  for col in ATTRIBUTE_TEXT_COLUMNS]
+    attributes_json = ["{" + ", ".join(filter(None, parts)) + "}" for parts in zip(*fragments)]
+    return pd.Series(attributes_json, index=df_raw.index, dtype=object)
+
+
 # --- NEW CLEANING FUNCTION ---
+@metrics.CLEAN_SECONDS.time()
 def clean_data(df_raw):
     # 1. Rename 'link' to 'url'
     df_raw.rename(columns={'link': 'url'}, inplace=True)
 
-    # 2. Generate 'id'
-    max_bigint = 9223372036854775807
-    df_raw['id'] = [abs(hash(uuid.uuid4())) % max_bigint for _ in range(len(df_raw))]
+    # 2. Generate 'id' (stable: the same listing URL always gets the same id)
+    df_raw['id'] = listing_id_column(df_raw['url'])
 
-    # 3. Add 'scraped_at'
-    df_raw['scraped_at'] = datetime.now().isoformat()
+    # 3. Add 'scraped_at' (pages re-parsed from the archive keep the time they were fetched)
+    scraped_at = datetime.now().isoformat(timespec="microseconds")
+    if 'fetched_at' in df_raw.columns:
+        df_raw['scraped_at'] = df_raw['fetched_at'].fillna(scraped_at)
+    else:
+        df_raw['scraped_at'] = scraped_at
 
     # 4. Handle 'marketplace_id'
     df_raw['marketplace_id'] = 1
@@ -731,34 +1804,14 @@ def clean_data(df_raw):
     # 5. Handle 'image_url'
     df_raw['image_url'] = ''
 
-    # 6. Handle 'attributes'
-    def create_attributes_json(row):
-        attributes = {}
-        # Handle list-like columns that are already parsed by parse_list
-        if row['amenities']:  # Check if list is not empty
-            attributes['amenities'] = row['amenities']
-        if row['apartment_features']:  # Check if list is not empty
-            attributes['apartment_features'] = row['apartment_features']
-        if row['additional_benefits']:  # Check if list is not empty
-            attributes['additional_benefits'] = row['additional_benefits']
-        if row['models']:  # Check if list is not empty
-            attributes['models'] = row['models']
-
-        # Handle other columns, ensuring they are not NaN and converted to string if needed
-        if row['property_specs_raw'] is not None:
-            attributes['property_specs_raw'] = str(row['property_specs_raw'])
-        if row['models_flat'] is not None:
-            attributes['models_flat'] = str(row['models_flat'])
-        if row['page_title'] is not None:
-            attributes['page_title'] = str(row['page_title'])
-        if row['subtitle'] is not None:
-            attributes['subtitle'] = str(row['subtitle'])
-        if row['listing_price'] is not None:
-            attributes['listing_price'] = str(row['listing_price'])
-
-        return json.dumps(attributes)
-
-    df_raw['attributes'] = df_raw.apply(create_attributes_json, axis=1)
+    # 6. Handle 'attributes'. Rows without details get no card fingerprint, so incremental crawls
+    # don't take them for scraped and skip them
+    if 'detail_fetched' in df_raw.columns and 'card_fingerprint' in df_raw.columns:
+        df_raw['card_fingerprint'] = pd.Series(
+            [fingerprint if fetched else None
+             for fingerprint, fetched in zip(df_raw['card_fingerprint'].tolist(), df_raw['detail_fetched'].tolist())],
+            index=df_raw.index, dtype=object)
+    df_raw['attributes'] = attributes_column(df_raw)
 
     # 7. Data Type Conversion and Cleaning
     df_raw['price'] = pd.to_numeric(df_raw['price'], errors='coerce').fillna(0).astype(float)
@@ -820,61 +1873,325 @@ def create_table_if_not_exists(cur):
     print(f"Table '{TABLE_NAME}' ensured to exist.")
 
 
-def load_data_to_db(df_cleaned):
-    """Loads data from the cleaned DataFrame into the PostgreSQL database."""
+_table_ready = False
+_table_lock = threading.Lock()
+
+
+def ensure_table():
+    """
+    Creates the listings table once per process, on its own autocommit connection, so the DDL
+    never runs (and holds locks) inside a load transaction.
+    """
+    global _table_ready
+    if _table_ready:
+        return
+    with _table_lock:
+        if _table_ready:
+            return
+        conn = get_db_connection()
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                create_table_if_not_exists(cur)
+            _table_ready = True
+        finally:
+            conn.close()
+
+
+# Secondary indexes of the listings table: the url lookup of incremental crawls, then the ones
+# behind GET /listings. One (sort column, id) B-tree per sort order, so a keyset page is a single
+# index range scan, a GIN index for amenity containment on attributes, and a trigram index for
+# location substring search (only when the pg_trgm extension is available).
+LISTING_INDEXES = [
+    ("frontend_product_url_idx", "(url)"),
+    ("frontend_product_price_idx", "(price, id)"),
+    ("frontend_product_area_idx", "(area_m2, id)"),
+    ("frontend_product_scraped_at_idx", "(scraped_at, id)"),
+    ("frontend_product_bedrooms_idx", "(bedrooms, scraped_at, id)"),
+    ("frontend_product_attributes_idx", "USING GIN (attributes jsonb_path_ops)"),
+]
+LOCATION_TRGM_INDEX = ("frontend_product_location_trgm_idx", "USING GIN (location gin_trgm_ops)")
+
+
+def create_listing_indexes():
+    """
+    Builds the missing LISTING_INDEXES with CREATE INDEX CONCURRENTLY, which doesn't block the
+    loads running meanwhile. Meant as a one-off startup step (the API runs it in the background):
+    an index whose earlier concurrent build was interrupted is left invalid, so it is dropped and
+    built again. Errors are reported and leave the table usable without that index.
+    """
+    ensure_table()
+    conn = get_db_connection()
+    conn.autocommit = True  # CONCURRENTLY can't run inside a transaction block
+    try:
+        with conn.cursor() as cur:
+            indexes = list(LISTING_INDEXES)
+            cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+            if cur.fetchone() is not None:
+                try:
+                    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+                    indexes.append(LOCATION_TRGM_INDEX)
+                except psycopg2.Error as e:
+                    # e.g. no permission to create the extension; location search still works as a filtered scan
+                    print(f"Location trigram index not created: {e}")
+
+            for name, definition in indexes:
+                cur.execute("""
+                    SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE c.relname = %s
+                """, (name,))
+                existing = cur.fetchone()
+                if existing and existing[0]:
+                    continue
+                try:
+                    if existing:
+                        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name};")
+                    print(f"Building index {name}...")
+                    cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {TABLE_NAME} {definition};")
+                except psycopg2.Error as e:
+                    print(f"Index {name} not created: {e}")
+    finally:
+        conn.close()
+
+
+def get_db_connection():
+    return psycopg2.connect(
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT
+    )
+
+
+def fetch_stored_fingerprints(urls):
+    """
+    Looks up, in one query, which of `urls` are already stored.
+    Returns {url: card_fingerprint} for the latest stored row of each (fingerprint may be None).
+    """
     conn = None
     try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
+        conn = get_db_connection()
+        ensure_table()
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT DISTINCT ON (url) url, attributes->>'card_fingerprint'
+            FROM {TABLE_NAME}
+            WHERE url = ANY(%s)
+            ORDER BY url, scraped_at DESC;
+        """, ([url[:200] for url in urls],))
+        stored = dict(cur.fetchall())
+        conn.commit()
+        cur.close()
+        return stored
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        return {}
+    finally:
+        if conn:
+            conn.close()
+
+
+def filter_new_or_changed(listings):
+    """
+    Incremental crawl: keeps only listings that are not stored yet, or whose card
+    title/price fingerprint differs from the stored one.
+    """
+    stored = fetch_stored_fingerprints([listing["link"] for listing in listings])
+    pending = [
+        listing for listing in listings
+        if stored.get(listing["link"][:200], "") != listing["card_fingerprint"]
+    ]
+    print(f"Incremental crawl: {len(listings) - len(pending)} unchanged listings skipped, {len(pending)} to scrape")
+    return pending
+
+
+# Bulk load settings: "copy" streams rows through COPY into a staging table, "values" sends
+# batched multi-row INSERTs (also the fallback when COPY is not possible)
+DB_LOAD_METHOD = os.getenv("DB_LOAD_METHOD", "copy")
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "5000"))
+# "upsert" rewrites a stored listing only when its content changed, "insert" never touches stored rows
+DB_WRITE_MODE = os.getenv("DB_WRITE_MODE", "upsert")
+
+LOAD_COLUMNS = [
+    'price', 'bathrooms', 'bedrooms', 'floor', 'parking', 'id',
+    'attributes', 'scraped_at', 'marketplace_id', 'area_m2',
+    'title', 'description', 'url', 'image_url', 'location'
+]
+STAGING_TABLE = "frontend_product_staging"
+# Columns whose change makes an upsert rewrite the stored row (scraped_at alone doesn't)
+UPSERT_COMPARE_COLUMNS = [
+    'price', 'bathrooms', 'bedrooms', 'floor', 'parking', 'area_m2', 'attributes',
+    'title', 'description', 'url', 'image_url', 'location'
+]
+COPY_NULL = "\\N"
+# Listing card fields, which a row re-parsed without its archived listing card doesn't have
+CARD_COLUMNS = ['title', 'price', 'location']
+
+
+def db_rows(df_cleaned):
+    """Rows of the cleaned DataFrame as lists in LOAD_COLUMNS order, ready for the database"""
+    # Convert NaN to None for database compatibility
+    df = df_cleaned[LOAD_COLUMNS].astype(object)
+    df = df.where(pd.notna(df), None)
+
+    attributes_at = LOAD_COLUMNS.index('attributes')
+    description_at = LOAD_COLUMNS.index('description')
+    for row in df.itertuples(index=False, name=None):
+        row = list(row)
+        row[attributes_at] = row[attributes_at] if row[attributes_at] else None
+        # Explicitly handle description to ensure it's not None
+        if row[description_at] is None:
+            row[description_at] = ""
+        yield row
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def conflict_clause(mode):
+    """
+    ON CONFLICT clause for the given write mode; the target table is aliased as `stored`.
+    "keep_card" upserts rows that have no listing card: the stored CARD_COLUMNS and card
+    fingerprint are kept, and only the other columns are compared and written.
+    """
+    if mode == "insert":
+        return "ON CONFLICT (id) DO NOTHING"
+    if mode == "keep_card":
+        columns = [column for column in LOAD_COLUMNS if column not in CARD_COLUMNS + ['id', 'attributes']]
+        compared = [column for column in UPSERT_COMPARE_COLUMNS if column not in CARD_COLUMNS + ['attributes']]
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns)
+        updates += (", attributes = EXCLUDED.attributes || jsonb_strip_nulls("
+                    "jsonb_build_object('card_fingerprint', stored.attributes->'card_fingerprint'))")
+        stored = ", ".join([f"stored.{column}" for column in compared] + ["stored.attributes - 'card_fingerprint'"])
+        incoming = ", ".join([f"EXCLUDED.{column}" for column in compared] + ["EXCLUDED.attributes - 'card_fingerprint'"])
+    else:
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in LOAD_COLUMNS if column != 'id')
+        stored = ", ".join(f"stored.{column}" for column in UPSERT_COMPARE_COLUMNS)
+        incoming = ", ".join(f"EXCLUDED.{column}" for column in UPSERT_COMPARE_COLUMNS)
+    return f"""ON CONFLICT (id) DO UPDATE SET {updates}
+        WHERE ({stored}) IS DISTINCT FROM ({incoming})"""
+
+
+def copy_load(cur, df_cleaned, batch_size=DB_BATCH_SIZE, mode=DB_WRITE_MODE):
+    """
+    Streams the rows through COPY FROM STDIN into a temporary staging table, then merges them
+    into TABLE_NAME with one INSERT ... SELECT. Returns the number of rows written.
+    """
+    columns = ", ".join(LOAD_COLUMNS)
+    cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (LIKE {TABLE_NAME}) ON COMMIT DROP;")
+    cur.execute(f"TRUNCATE {STAGING_TABLE};")
+
+    for batch in _batches(db_rows(df_cleaned), batch_size):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([COPY_NULL if value is None else value for value in row] for row in batch)
+        buffer.seek(0)
+        cur.copy_expert(
+            f"COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')", buffer
         )
+
+    cur.execute(f"""
+        INSERT INTO {TABLE_NAME} AS stored ({columns})
+        SELECT {columns} FROM {STAGING_TABLE}
+        {conflict_clause(mode)};
+    """)
+    return cur.rowcount
+
+
+def values_load(cur, df_cleaned, batch_size=DB_BATCH_SIZE, mode=DB_WRITE_MODE):
+    """Writes the rows with batched multi-row INSERTs. Returns the number of rows written."""
+    insert_query = f"""
+    INSERT INTO {TABLE_NAME} AS stored ({", ".join(LOAD_COLUMNS)})
+    VALUES %s
+    {conflict_clause(mode)};
+    """
+    written = 0
+    for batch in _batches(db_rows(df_cleaned), batch_size):
+        psycopg2.extras.execute_values(cur, insert_query, batch, page_size=batch_size)
+        written += cur.rowcount
+    return written
+
+
+def _row_mask(mask, index):
+    """A boolean row mask (or None, no row) aligned on `index`"""
+    if mask is None:
+        return pd.Series(False, index=index)
+    return mask.reindex(index, fill_value=False).astype(bool)
+
+
+def _write_rows(cur, df_cleaned, method, batch_size, mode):
+    if not len(df_cleaned):
+        return 0
+    if method == "copy":
+        cur.execute("SAVEPOINT bulk_load;")
+        try:
+            return copy_load(cur, df_cleaned, batch_size, mode)
+        except psycopg2.Error as e:
+            # e.g. no permission for temporary tables, or COPY blocked by a pooler
+            print(f"COPY load failed ({e}), falling back to batched inserts")
+            cur.execute("ROLLBACK TO SAVEPOINT bulk_load;")
+    return values_load(cur, df_cleaned, batch_size, mode)
+
+
+@metrics.DB_LOAD_SECONDS.time()
+def load_data_to_db(df_cleaned, method=DB_LOAD_METHOD, batch_size=DB_BATCH_SIZE, mode=DB_WRITE_MODE,
+                    insert_only=None, keep_card=None):
+    """
+    Loads data from the cleaned DataFrame into the PostgreSQL database.
+    Returns the number of rows written: new listings, plus (in upsert mode) stored listings
+    whose content changed. Unchanged listings are skipped.
+
+    `insert_only` (a boolean Series on df_cleaned's index) marks rows that are only stored when
+    the listing is new, never over a stored one: the rows whose detail page could not be fetched,
+    which would otherwise blank out the details scraped before. `keep_card` likewise marks rows
+    without their listing card (re-parsed detail pages): a stored listing keeps its title, price,
+    location and card fingerprint, and only its details are updated.
+
+    A failed load is rolled back and its error raised, so callers never count the batch as stored.
+    """
+    conn = None
+    written = 0
+    try:
+        ensure_table()
+        conn = get_db_connection()
         cur = conn.cursor()
 
-        create_table_if_not_exists(cur)
-
-        # Prepare for insertion
-        # Convert NaN to None for database compatibility
-        df_cleaned = df_cleaned.where(pd.notna(df_cleaned), None)
-
-        for index, row in df_cleaned.iterrows():
-            insert_query = f"""
-            INSERT INTO {TABLE_NAME} (
-                price, bathrooms, bedrooms, floor, parking, id,
-                attributes, scraped_at, marketplace_id, area_m2,
-                title, description, url, image_url, location
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s,
-                %s, %s, %s, %s, %s
-            ) ON CONFLICT (id) DO NOTHING;
-            """
-            attributes_data = row['attributes'] if row['attributes'] else None
-
-            # Explicitly handle description to ensure it's not None
-            description_data = row['description'] if row['description'] is not None else ""
-
-            cur.execute(insert_query, (
-                row['price'], row['bathrooms'], row['bedrooms'], row['floor'], row['parking'], row['id'],
-                attributes_data, row['scraped_at'], row['marketplace_id'], row['area_m2'],
-                row['title'], description_data, row['url'], row['image_url'], row['location']
-            ))
+        # A listing seen twice in one crawl can only be written once per statement
+        df_cleaned = df_cleaned.drop_duplicates(subset='id', keep='last')
+
+        insert_only = _row_mask(insert_only, df_cleaned.index)
+        keep_card = _row_mask(keep_card, df_cleaned.index) & ~insert_only
+        written = _write_rows(cur, df_cleaned[~(insert_only | keep_card)], method, batch_size, mode)
+        written += _write_rows(cur, df_cleaned[insert_only], method, batch_size, "insert")
+        written += _write_rows(cur, df_cleaned[keep_card], method, batch_size,
+                               "keep_card" if mode == "upsert" else mode)
 
         conn.commit()
-        print(f"Data loaded successfully into '{TABLE_NAME}'.")
+        metrics.DB_ROWS.labels("written").inc(written)
+        metrics.DB_ROWS.labels("skipped").inc(len(df_cleaned) - written)
+        print(f"Data loaded successfully into '{TABLE_NAME}': {written} written, "
+              f"{len(df_cleaned) - written} unchanged.")
 
-    except psycopg2.Error as e:
-        print(f"Database error: {e}")
+    except Exception as e:
+        print(f"Database load failed: {e}")
         if conn:
             conn.rollback()
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        raise
     finally:
         if conn:
             cur.close()
             conn.close()
             print("Database connection closed.")
 
+    return written
+
 
@@ -0,0 +1,188 @@
+import multiprocessing.util
+import os
+import sqlite3
+import threading
+import time
+
+import soupsieve
+
+SELECTOR_STATS_ENABLED = os.getenv("SELECTOR_STATS_ENABLED", "1") == "1"  # 0: don't count selector tries and hits
+SELECTOR_STATS_PATH = os.getenv("SELECTOR_STATS_PATH", ".cache/selector_stats.sqlite")
+SELECTOR_STATS_FLUSH_EVERY = int(os.getenv("SELECTOR_STATS_FLUSH_EVERY", "200"))  # Lookups between writes of the counts
+
+_chains = {}
+_chains_lock = threading.Lock()
+_db_lock = threading.Lock()
+_lookups = 0
+
+
+class SelectorChain:
+    """
+    The fallback selectors of one extracted field, compiled once and always all tried in their
+    listed priority order, so what a page extracts never depends on earlier crawls.
+
+    Per-selector tries and hits (lookups where the selector found an element) are counted and
+    saved to SELECTOR_STATS_PATH for reporting only (GET /selectors): they show which fallbacks
+    the current layout still needs.
+    """
+
+    def __init__(self, field, selectors):
+        self.field = field
+        self.selectors = list(selectors)
+        self.compiled = [soupsieve.compile(selector) for selector in self.selectors]
+        self.tries = [0] * len(self.selectors)
+        self.hits = [0] * len(self.selectors)
+        self.last_hit = [0.0] * len(self.selectors)
+        self._flushed = ([0] * len(self.selectors), [0] * len(self.selectors))
+        self._lock = threading.Lock()
+
+    def first(self, root, extract=None, accept=None, fallback=False):
+        """
+        The first value, in listed order, that `accept` takes: extract(element) of the first
+        element each selector finds under `root` (the element itself without `extract`; any value
+        is acceptable without `accept`). With `fallback`, when no value is accepted the one the
+        last matching selector gave is returned instead of None.
+        """
+        _count_lookup()
+        value = None
+        for i, compiled in enumerate(self.compiled):
+            self._tried(i)
+            element = compiled.select_one(root)
+            if element is None:
+                continue
+            self._hit(i)
+            value = extract(element) if extract else element
+            if accept is None or accept(value):
+                return value
+        return value if fallback else None
+
+    def first_css(self, node):
+        """first() for a selectolax node: the first element a selector finds, with the same stats"""
+        _count_lookup()
+        for i, selector in enumerate(self.selectors):
+            self._tried(i)
+            element = node.css_first(selector)
+            if element is not None:
+                self._hit(i)
+                return element
+        return None
+
+    def select(self, root):
+        """Every element the first matching selector finds (an empty list if none matches)"""
+        _count_lookup()
+        for i, compiled in enumerate(self.compiled):
+            self._tried(i)
+            elements = compiled.select(root)
+            if elements:
+                self._hit(i)
+                return elements
+        return []
+
+    def _tried(self, i):
+        if SELECTOR_STATS_ENABLED:
+            self.tries[i] += 1
+
+    def _hit(self, i):
+        if SELECTOR_STATS_ENABLED:
+            self.hits[i] += 1
+            self.last_hit[i] = time.time()
+
+    def pending(self):
+        """(selector, new tries, new hits, last hit) since the last flush, marking them flushed"""
+        with self._lock:
+            flushed_tries, flushed_hits = self._flushed
+            rows = [(self.selectors[i], self.tries[i] - flushed_tries[i], self.hits[i] - flushed_hits[i],
+                     self.last_hit[i] or None) for i in range(len(self.selectors))]
+            self._flushed = (list(self.tries), list(self.hits))
+        return [row for row in rows if row[1]]
+
+
+def chain(field, selectors):
+    """The process-wide SelectorChain of `field` (created on first use)"""
+    with _chains_lock:
+        if field not in _chains:
+            _chains[field] = SelectorChain(field, selectors)
+        return _chains[field]
+
+
+_conn = None
+
+
+def _connect():
+    """Connection to the stats database, opened on first use (caller holds _db_lock)"""
+    global _conn
+    if _conn is None:
+        directory = os.path.dirname(SELECTOR_STATS_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _conn = sqlite3.connect(SELECTOR_STATS_PATH, check_same_thread=False, isolation_level=None, timeout=30)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS selector_stats (
+                field TEXT NOT NULL,
+                selector TEXT NOT NULL,
+                tries INTEGER NOT NULL,
+                hits INTEGER NOT NULL,
+                last_hit REAL,
+                PRIMARY KEY (field, selector)
+            )
+        """)
+    return _conn
+
+
+def _count_lookup():
+    global _lookups
+    if not SELECTOR_STATS_ENABLED:
+        return
+    _lookups += 1
+    if _lookups % SELECTOR_STATS_FLUSH_EVERY == 0:
+        flush()
+
+
+def flush():
+    """Adds the counts gathered since the last flush to the stats database"""
+    rows = [(c.field, *row) for c in list(_chains.values()) for row in c.pending()]
+    if not rows:
+        return
+    try:
+        with _db_lock:
+            _connect().executemany("""
+                INSERT INTO selector_stats (field, selector, tries, hits, last_hit) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (field, selector) DO UPDATE SET
+                    tries = tries + excluded.tries,
+                    hits = hits + excluded.hits,
+                    last_hit = COALESCE(max(last_hit, excluded.last_hit), last_hit, excluded.last_hit)
+            """, rows)
+    except sqlite3.Error as e:
+        print(f"Could not save selector stats: {e}")
+
+
+def stats():
+    """
+    Saved tries, hits and hit rate of every selector by field, summed over every process and
+    run, in listed order for the fields this process has used
+    """
+    flush()
+    try:
+        with _db_lock:
+            rows = _connect().execute(
+                "SELECT field, selector, tries, hits, last_hit FROM selector_stats ORDER BY field").fetchall()
+    except sqlite3.Error as e:
+        print(f"Could not read selector stats: {e}")
+        return {}
+
+    result = {}
+    for field, selector, tries, hits, last_hit in rows:
+        result.setdefault(field, []).append({"selector": selector, "tries": tries, "hits": hits,
+                                             "hit_rate": round(hits / tries, 3) if tries else None,
+                                             "last_hit": last_hit})
+    for field, entries in result.items():
+        selector_chain = _chains.get(field)
+        position = {selector: n for n, selector in enumerate(selector_chain.selectors)} if selector_chain else {}
+        entries.sort(key=lambda entry: (position.get(entry["selector"], len(position)), -entry["hits"]))
+    return result
+
+
+# Runs at interpreter exit, and also when a multiprocessing worker (a parse process) exits,
+# where atexit handlers are skipped
+multiprocessing.util.Finalize(None, flush, exitpriority=10)